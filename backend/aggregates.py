@@ -0,0 +1,170 @@
+# Present/total attendance counters per (student, course) and per course class.
+# crud keeps them in step with every write inside the writer's transaction, so reads are a
+# primary key lookup instead of a scan of the attendance table.
+#
+# run "python -m backend.aggregates" to check the counters against attendance, "--repair" to rebuild them
+
+import sys
+
+from sqlalchemy import bindparam, case, delete, func, insert, literal, select, union_all, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models, storage
+
+student_stats = models.StudentCourseStats.__table__
+class_stats = models.CourseClassStats.__table__
+# archived attendance still counts: moving a term to the archive leaves the counters untouched
+attendance_tables = (models.Attendance.__table__, models.AttendanceArchive.__table__)
+# with lazy storage the counters also cover the unmarked cells, which are absences without a row
+counted = attendance_tables + ((storage.unmarked,) if storage.LAZY else ())
+
+
+def _present_count(attendance=models.Attendance.__table__):
+    return func.sum(case((attendance.c.present, 1), else_=0))
+
+def _all_attendance():
+    return union_all(*(select(t.c.student_id, t.c.course_class_id, t.c.present) for t in counted)).subquery()
+
+def _insert_missing(db: Session, table, rows):
+    # a concurrent writer may create the same counter row between our SELECT and INSERT; the
+    # duplicate is skipped and the UPDATE below adds to whichever row won
+    dialect = db.get_bind().dialect.name
+    if dialect in ("mysql", "mariadb"):
+        statement = mysql.insert(table).on_duplicate_key_update(present=table.c.present)
+    elif dialect == "postgresql":
+        statement = postgresql.insert(table).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        statement = sqlite.insert(table).on_conflict_do_nothing()
+    else:
+        statement = insert(table)
+    db.execute(statement, rows)
+
+def _apply(db: Session, table, key_columns, deltas, touch: bool = False):
+    # deltas: {key tuple: (present delta, total delta)}; rows missing from the table start at zero.
+    # touch also bumps the revision of every keyed row, including ones whose counts net out to zero
+    if not touch:
+        deltas = {key: delta for key, delta in deltas.items() if delta != (0, 0)}
+    if not deltas:
+        return
+    columns = [table.c[name] for name in key_columns]
+    existing = select(*columns)
+    for position, column in enumerate(columns):
+        existing = existing.where(column.in_({key[position] for key in deltas}))
+    existing = {tuple(row) for row in db.execute(existing)}
+    missing = [key for key in deltas if key not in existing]
+    if missing:
+        _insert_missing(db, table, [dict(zip(key_columns, key), present=0, total=0) for key in missing])
+
+    statement = update(table).values(present=table.c.present + bindparam("d_present"), total=table.c.total + bindparam("d_total"))
+    if touch:
+        statement = statement.values(revision=table.c.revision + 1)
+    for name, column in zip(key_columns, columns):
+        statement = statement.where(column == bindparam(f"k_{name}"))
+    db.execute(statement, [
+        {**{f"k_{name}": value for name, value in zip(key_columns, key)}, "d_present": present, "d_total": total}
+        for key, (present, total) in deltas.items()
+    ])
+
+def _apply_grouped(db: Session, condition, sign=1, attendance=models.Attendance.__table__):
+    # fold the attendance rows matching condition into both counter tables, added (sign=1) or removed (sign=-1)
+    joined = select().select_from(attendance).join(models.CourseClass, models.CourseClass.id == attendance.c.course_class_id).where(condition)
+    by_student = db.execute(
+        joined.add_columns(attendance.c.student_id, models.CourseClass.course_code, _present_count(attendance), func.count())
+        .group_by(attendance.c.student_id, models.CourseClass.course_code)
+    )
+    _apply(db, student_stats, ("student_id", "course_code"), {(s, c): (sign * p, sign * t) for s, c, p, t in by_student})
+    by_class = db.execute(
+        joined.add_columns(attendance.c.course_class_id, _present_count(attendance), func.count()).group_by(attendance.c.course_class_id)
+    )
+    _apply(db, class_stats, ("course_class_id",), {(c,): (sign * p, sign * t) for c, p, t in by_class}, touch=True)
+
+def classes_seeded(db: Session, class_ids):
+    attendance_added(db, models.Attendance.course_class_id.in_(class_ids))
+
+def attendance_added(db: Session, condition):
+    # call after inserting the attendance rows matching condition
+    _apply_grouped(db, condition)
+
+def unmarked_added(db: Session, condition):
+    # lazy storage: call after creating the classes or enrollments behind the unmarked cells matching condition
+    _apply_grouped(db, condition, attendance=storage.unmarked)
+
+def marks_changed(db: Session, course_class_id: int, changes: dict):
+    # changes: {student_id: new present value} for rows whose value actually flipped
+    if not changes:
+        return
+    course_code = db.scalar(select(models.CourseClass.course_code).where(models.CourseClass.id == course_class_id))
+    deltas = {(student_id, course_code): (1 if present else -1, 0) for student_id, present in changes.items()}
+    _apply(db, student_stats, ("student_id", "course_code"), deltas)
+    _apply(db, class_stats, ("course_class_id",), {(course_class_id,): (sum(delta for delta, _ in deltas.values()), 0)}, touch=True)
+
+def touch(db: Session, class_ids):
+    # for changes that move attendance without changing the counters, e.g. archiving
+    db.execute(update(class_stats).where(class_stats.c.course_class_id.in_(class_ids)).values(revision=class_stats.c.revision + 1))
+
+def attendance_removed(db: Session, condition, attendance=models.Attendance.__table__):
+    # call before deleting the attendance rows matching condition
+    _apply_grouped(db, condition, sign=-1, attendance=attendance)
+
+def class_removed(db: Session, course_class_id: int):
+    classes_removed(db, [course_class_id])
+
+def classes_removed(db: Session, class_ids):
+    for attendance in counted:
+        _apply_grouped(db, attendance.c.course_class_id.in_(class_ids), sign=-1, attendance=attendance)
+    db.execute(delete(class_stats).where(class_stats.c.course_class_id.in_(class_ids)))
+
+def course_removed(db: Session, course_code: str):
+    classes = select(models.CourseClass.id).where(models.CourseClass.course_code == course_code)
+    db.execute(delete(class_stats).where(class_stats.c.course_class_id.in_(classes)))
+    db.execute(delete(student_stats).where(student_stats.c.course_code == course_code))
+
+def student_removed(db: Session, student_id: str):
+    rows = _all_attendance()
+    by_class = db.execute(
+        select(rows.c.course_class_id, _present_count(rows), func.count())
+        .where(rows.c.student_id == student_id).group_by(rows.c.course_class_id)
+    )
+    _apply(db, class_stats, ("course_class_id",), {(c,): (-p, -t) for c, p, t in by_class}, touch=True)
+    db.execute(delete(student_stats).where(student_stats.c.student_id == student_id))
+
+def _expected():
+    rows = _all_attendance()
+    joined = select().select_from(rows).join(models.CourseClass, models.CourseClass.id == rows.c.course_class_id)
+    by_student = joined.add_columns(rows.c.student_id, models.CourseClass.course_code, _present_count(rows), func.count()).group_by(
+        rows.c.student_id, models.CourseClass.course_code)
+    by_class = select(rows.c.course_class_id, _present_count(rows), func.count()).group_by(rows.c.course_class_id)
+    return by_student, by_class
+
+def rebuild(db: Session, repair: bool = False):
+    by_student, by_class = _expected()
+    drift = {}
+    for name, table, keys, expected in (("student_course", student_stats, 2, by_student), ("course_class", class_stats, 1, by_class)):
+        columns = [c for c in table.c if c.name != "revision"]
+        want = {tuple(row[:keys]): tuple(row[keys:]) for row in db.execute(expected)}
+        have = {tuple(row[:keys]): tuple(row[keys:]) for row in db.execute(select(*columns)) if tuple(row[keys:]) != (0, 0)}
+        drift[name] = sum(1 for key in want.keys() | have.keys() if want.get(key, (0, 0)) != have.get(key, (0, 0)))
+        if repair and drift[name]:
+            names = [c.name for c in columns]
+            if "revision" in table.c:
+                # rebuilt rows start above every revision handed out so far, so old ETags never match again
+                expected = expected.add_columns(literal((db.scalar(select(func.max(table.c.revision))) or 0) + 1))
+                names.append("revision")
+            db.execute(delete(table))
+            db.execute(insert(table).from_select(names, expected))
+    if repair:
+        db.commit()
+    return drift
+
+if __name__ == "__main__":
+    from .database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        drift = rebuild(db, repair="--repair" in sys.argv)
+    finally:
+        db.close()
+    for name, count in drift.items():
+        print(f"{name}: {count} drifted counter(s)")
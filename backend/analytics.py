@@ -0,0 +1,152 @@
+# Attendance reports for administrators: students below an attendance threshold per course,
+# attendance by weekday or hour of the class, and per-instructor summaries. The grouping happens in
+# SQL, over the aggregate counters where they already hold the sums (whole history per student and
+# course, per class) and over the attendance rows only for a threshold report limited to a date
+# range, so a report reads a few thousand rows at most instead of millions.
+#
+# A term is a date range over CourseClass.date_time. Results are cached per term and filters under
+# a key that includes the revisions of the term's classes and the enrollment count, so any mark,
+# new class or roster change is picked up by the next request. Reports that name students or
+# instructors also key on a hash of those ids, which a rename changes.
+#
+# run "python -m backend.analytics threshold|trend|instructors [--course C101] [--from 2026-09-01 --to 2027-01-01]"
+
+import argparse
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from . import cache, crud, models
+from .schedule import WEEKDAYS
+
+DEFAULT_THRESHOLD = 75
+
+
+def _digest(rows):
+    return hashlib.sha1(repr([tuple(row) for row in rows]).encode()).hexdigest()
+
+def _version(db: Session, conditions, course_code: str | None, instructors: bool = False, students: bool = False):
+    classes = db.execute(
+        select(func.count(models.CourseClass.id), func.max(models.CourseClass.id), func.coalesce(func.sum(models.CourseClassStats.revision), 0))
+        .outerjoin(models.CourseClassStats, models.CourseClassStats.course_class_id == models.CourseClass.id)
+        .where(*conditions)
+    ).one()
+    enrollments = select(func.count(models.Enrollment.id), func.max(models.Enrollment.id))
+    if course_code is not None:
+        enrollments = enrollments.where(models.Enrollment.course_code == course_code)
+    version = (*classes, *db.execute(enrollments).one())
+    if instructors:
+        # reassigning a course moves its classes to another instructor without touching them
+        version += (_digest(db.execute(select(models.Course.code, models.Course.instructor_id).order_by(models.Course.code))),)
+    if students:
+        # renaming a student cascades the new id into the enrollments, keeping their count and ids
+        roster = select(models.Enrollment.id, models.Enrollment.student_id).order_by(models.Enrollment.id)
+        if course_code is not None:
+            roster = roster.where(models.Enrollment.course_code == course_code)
+        version += (_digest(db.execute(roster)),)
+    return version
+
+def _cached(db: Session, report, conditions, course_code, load, instructors: bool = False, students: bool = False):
+    return cache.memoize("analytics", repr((report, _version(db, conditions, course_code, instructors, students))), load)
+
+
+def _below_threshold(db: Session, conditions, threshold: float, course_code, date_from, date_to):
+    if date_from is None and date_to is None:
+        # the whole history is what the per (student, course) counters hold
+        stats = models.StudentCourseStats
+        query = (
+            select(stats.student_id, stats.course_code, stats.present, stats.total)
+            .join(models.Enrollment, (models.Enrollment.student_id == stats.student_id) & (models.Enrollment.course_code == stats.course_code))
+            .where(stats.total > 0, stats.present * 100 < threshold * stats.total)
+        )
+        if course_code is not None:
+            query = query.where(stats.course_code == course_code)
+    else:
+        # archived rows count too, as they do in the counters
+        source = crud.attendance_source(True, course_code=course_code, date_from=date_from, date_to=date_to)
+        present, total = func.sum(case((source.present, 1), else_=0)), func.count()
+        query = (
+            select(source.student_id, models.CourseClass.course_code, present, total)
+            .join(models.CourseClass, models.CourseClass.id == source.course_class_id)
+            .join(models.Enrollment, (models.Enrollment.student_id == source.student_id) & (models.Enrollment.course_code == models.CourseClass.course_code))
+            .where(*conditions)
+            .group_by(source.student_id, models.CourseClass.course_code)
+            .having(present * 100 < threshold * total)
+        )
+    rows = db.execute(query).all()
+    return sorted(((student_id, code, int(p), int(t)) for student_id, code, p, t in rows), key=lambda row: (row[1], row[2] / row[3], row[0]))
+
+def below_threshold(db: Session, threshold: float = DEFAULT_THRESHOLD, course_code: str | None = None, date_from: datetime | None = None, date_to: datetime | None = None):
+    # (student_id, course_code, present, total) of enrolled students under threshold percent, by course, lowest first
+    conditions = crud.class_conditions(course_code=course_code, date_from=date_from, date_to=date_to)
+    return _cached(db, ("threshold", threshold, course_code, date_from, date_to), conditions, course_code,
+                   lambda: _below_threshold(db, conditions, threshold, course_code, date_from, date_to), students=True)
+
+
+def _trend(db: Session, conditions, by: str):
+    # per-class counters, bucketed here: a term has thousands of classes, not millions of rows
+    classes = db.execute(
+        select(models.CourseClass.date_time, models.CourseClassStats.present, models.CourseClassStats.total)
+        .join(models.CourseClassStats, models.CourseClassStats.course_class_id == models.CourseClass.id)
+        .where(models.CourseClass.date_time.is_not(None), *conditions)
+    )
+    buckets = {}
+    for date_time, present, total in classes:
+        bucket = WEEKDAYS[date_time.weekday()] if by == "weekday" else date_time.hour
+        counts = buckets.setdefault(bucket, [0, 0, 0])
+        counts[0] += 1
+        counts[1] += present
+        counts[2] += total
+    order = WEEKDAYS.index if by == "weekday" else int
+    return [(bucket, *buckets[bucket]) for bucket in sorted(buckets, key=order)]
+
+def trend(db: Session, by: str = "weekday", course_code: str | None = None, date_from: datetime | None = None, date_to: datetime | None = None):
+    # (weekday or hour, classes, present, total), in weekday or hour order
+    conditions = crud.class_conditions(course_code=course_code, date_from=date_from, date_to=date_to)
+    return _cached(db, ("trend", by, course_code, date_from, date_to), conditions, course_code, lambda: _trend(db, conditions, by))
+
+
+def _instructors(db: Session, conditions):
+    rows = db.execute(
+        select(models.Course.instructor_id, func.count(func.distinct(models.Course.code)), func.count(models.CourseClass.id),
+               func.coalesce(func.sum(models.CourseClassStats.present), 0), func.coalesce(func.sum(models.CourseClassStats.total), 0))
+        .select_from(models.CourseClass)
+        .join(models.Course, models.Course.code == models.CourseClass.course_code)
+        .outerjoin(models.CourseClassStats, models.CourseClassStats.course_class_id == models.CourseClass.id)
+        .where(*conditions)
+        .group_by(models.Course.instructor_id)
+        .order_by(models.Course.instructor_id)
+    )
+    return [tuple(int(value) if i else value for i, value in enumerate(row)) for row in rows]
+
+def instructors(db: Session, date_from: datetime | None = None, date_to: datetime | None = None):
+    # (instructor_id, courses, classes, present, total) over the classes held in the range
+    conditions = crud.class_conditions(date_from=date_from, date_to=date_to)
+    return _cached(db, ("instructors", date_from, date_to), conditions, None, lambda: _instructors(db, conditions), instructors=True)
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("report", choices=["threshold", "trend", "instructors"])
+    parser.add_argument("--course")
+    parser.add_argument("--from", dest="date_from", type=datetime.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=datetime.fromisoformat)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--by", choices=["weekday", "hour"], default="weekday")
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        if args.report == "threshold":
+            rows = below_threshold(db, args.threshold, args.course, args.date_from, args.date_to)
+        elif args.report == "trend":
+            rows = trend(db, args.by, args.course, args.date_from, args.date_to)
+        else:
+            rows = instructors(db, args.date_from, args.date_to)
+    finally:
+        db.close()
+    for row in rows:
+        print(*row, sep="\t")
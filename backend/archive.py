@@ -0,0 +1,77 @@
+# Moves the attendance of closed terms out of the live attendance table into attendance_archive,
+# a class at a time in batches, so the live table only holds the current range. Rows keep their
+# ids and the aggregate counters already include them, so nothing else has to change; reads
+# see archived rows only when asked for history. --restore moves a range back for corrections.
+#
+# run "python -m backend.archive --before 2025-09-01" (classes held before that date)
+# or  "python -m backend.archive --restore --after 2025-01-01 --before 2025-09-01"
+
+import argparse
+from datetime import datetime
+
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.orm import Session
+
+from . import aggregates, models, storage
+
+BATCH_CLASSES = 100
+COLUMNS = ["id", "student_id", "course_class_id", "present"]
+
+live = models.Attendance.__table__
+archived = models.AttendanceArchive.__table__
+
+
+def _move(db: Session, source, target, before: datetime, after: datetime | None, batch_classes: int, progress, materialize: bool = False):
+    moved = 0
+    pending = models.CourseClass.id.in_(select(source.c.course_class_id))
+    if materialize:
+        pending = or_(pending, models.CourseClass.id.in_(select(storage.unmarked.c.course_class_id)))
+    while True:
+        # classes in the range that still have rows in the source table, oldest first
+        classes = (
+            select(models.CourseClass.id)
+            .where(models.CourseClass.date_time < before, pending)
+            .order_by(models.CourseClass.id).limit(batch_classes)
+        )
+        if after is not None:
+            classes = classes.where(models.CourseClass.date_time >= after)
+        class_ids = list(db.scalars(classes))
+        if not class_ids:
+            return moved
+        if materialize:
+            # with lazy storage an archived class keeps all its cells as rows, so they stop being derived as live
+            storage.materialize(db, models.CourseClass.id.in_(class_ids))
+        rows = select(*(source.c[name] for name in COLUMNS)).where(source.c.course_class_id.in_(class_ids))
+        db.execute(insert(target).from_select(COLUMNS, rows))
+        moved += db.execute(delete(source).where(source.c.course_class_id.in_(class_ids))).rowcount
+        aggregates.touch(db, class_ids)
+        # one transaction per batch: a row is always in exactly one of the two tables
+        db.commit()
+        if progress is not None:
+            progress(moved)
+
+def archive(db: Session, before: datetime, after: datetime | None = None, batch_classes: int = BATCH_CLASSES, progress=None):
+    return _move(db, live, archived, before, after, batch_classes, progress, materialize=storage.LAZY)
+
+def restore(db: Session, before: datetime, after: datetime | None = None, batch_classes: int = BATCH_CLASSES, progress=None):
+    return _move(db, archived, live, before, after, batch_classes, progress)
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--before", type=datetime.fromisoformat, required=True, help="move classes held before this date")
+    parser.add_argument("--after", type=datetime.fromisoformat, help="only classes held on or after this date")
+    parser.add_argument("--restore", action="store_true", help="move archived rows back into the live table")
+    parser.add_argument("--batch-classes", type=int, default=BATCH_CLASSES)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        move = restore if args.restore else archive
+        moved = move(db, args.before, args.after, args.batch_classes, progress=lambda n: print(f"{n} rows moved"))
+    finally:
+        db.close()
+    print(f"{moved} attendance rows {'restored' if args.restore else 'archived'}")
@@ -0,0 +1,113 @@
+# AsyncSession counterparts of crud.py. Reads run natively on the async driver; writes hand the
+# sync crud function to run_sync so the aggregate bookkeeping lives in one place.
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import auth, cache, crud, models, schemas
+
+
+async def get_user_by_id(db: AsyncSession, user_id: str):
+    return await cache.read_through_async(db, "user", user_id, lambda: db.scalar(select(models.User).where(models.User.id == user_id)))
+
+async def get_user_with_password(db: AsyncSession, user_id: str):
+    # the cache leaves password hashes out, so the login check reads the row itself
+    return await db.scalar(select(models.User).where(models.User.id == user_id))
+
+async def get_users_by_role(db: AsyncSession, role: str):
+    return (await db.scalars(select(models.User).where(models.User.role == role))).all()
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    # hashed in the pool while the loop keeps serving; inside run_sync it would block the loop
+    return await db.run_sync(crud.create_user, user, await auth.hash_password_async(user.password))
+
+async def update_user(db: AsyncSession, user: schemas.User, user_id: str):
+    return await db.run_sync(crud.update_user, user, user_id)
+
+async def delete_user(db: AsyncSession, user_id: str):
+    await db.run_sync(crud.delete_user, user_id)
+
+async def set_password_hash(db: AsyncSession, user_id: str, password_hash: str):
+    await db.run_sync(crud.set_password_hash, user_id, password_hash)
+
+async def get_course_by_code(db: AsyncSession, code: str):
+    return await cache.read_through_async(db, "course", code, lambda: db.scalar(select(models.Course).where(models.Course.code == code)))
+
+async def get_course_by_instructor(db: AsyncSession, instructor_id: str):
+    return (await db.scalars(select(models.Course).where(models.Course.instructor_id == instructor_id))).all()
+
+async def create_course(db: AsyncSession, course: schemas.CourseCreate):
+    return await db.run_sync(crud.create_course, course)
+
+async def update_course(db: AsyncSession, course: schemas.Course, course_code: str):
+    return await db.run_sync(crud.update_course, course, course_code)
+
+async def delete_course(db: AsyncSession, coursecode: str):
+    await db.run_sync(crud.delete_course, coursecode)
+
+async def get_enrollment_by_id(db: AsyncSession, id: int):
+    return await db.scalar(select(models.Enrollment).where(models.Enrollment.id == id))
+
+async def get_enrollment_by_student_id(db: AsyncSession, studentid: str):
+    return (await db.scalars(select(models.Enrollment).where(models.Enrollment.student_id == studentid))).all()
+
+async def get_enrollment_by_course_code(db: AsyncSession, coursecode: str):
+    async def load():
+        return (await db.scalars(select(models.Enrollment).where(models.Enrollment.course_code == coursecode))).all()
+    return await cache.read_through_async(db, "roster", coursecode, load)
+
+async def get_enrollment_by_courseandstudent(db: AsyncSession, coursecode: str, studentid: str):
+    return await db.scalar(select(models.Enrollment).where(and_(models.Enrollment.course_code == coursecode, models.Enrollment.student_id == studentid)))
+
+async def create_enrollment(db: AsyncSession, enrollment: schemas.EnrollmentCreate):
+    return await db.run_sync(crud.create_enrollment, enrollment)
+
+async def delete_enrollment(db: AsyncSession, enrollmentid: int):
+    await db.run_sync(crud.delete_enrollment, enrollmentid)
+
+async def get_course_class_by_id(db: AsyncSession, id: int):
+    return await db.scalar(select(models.CourseClass).where(models.CourseClass.id == id))
+
+async def get_course_class_by_course_code(db: AsyncSession, coursecode: str):
+    return (await db.scalars(select(models.CourseClass).where(models.CourseClass.course_code == coursecode))).all()
+
+async def create_course_class(db: AsyncSession, course_class: schemas.CourseClassCreate):
+    return await db.run_sync(crud.create_course_class, course_class)
+
+async def delete_course_class(db: AsyncSession, class_id: int):
+    await db.run_sync(crud.delete_course_class, class_id)
+
+async def get_attendance_by_id(db: AsyncSession, id: int):
+    if id < 0:
+        return await db.run_sync(crud.get_attendance_by_id, id)
+    return await db.scalar(select(models.Attendance).where(models.Attendance.id == id))
+
+def select_entity(entity, fields=None):
+    # the entity itself, or only the named columns as plain rows (for the fastjson routes)
+    return select(entity) if fields is None else select(*(getattr(entity, name) for name in fields))
+
+async def rows(db: AsyncSession, statement, fields=None):
+    return (await (db.scalars(statement) if fields is None else db.execute(statement))).all()
+
+async def get_attendance_by_student_id(db: AsyncSession, studentid: str, history: bool = False, fields=None):
+    source = crud.attendance_source(history)
+    return await rows(db, select_entity(source, fields).where(source.student_id == studentid), fields)
+
+async def get_attendance_by_course_class_id(db: AsyncSession, courseclassid: int, history: bool = False, fields=None):
+    source = crud.attendance_source(history)
+    return await rows(db, select_entity(source, fields).where(source.course_class_id == courseclassid), fields)
+
+async def update_attendance(db: AsyncSession, attendanceid: int, present: bool):
+    return await db.run_sync(crud.update_attendance, attendanceid, present)
+
+async def mark_attendance_batch(db: AsyncSession, batch: schemas.AttendanceBatchUpdate):
+    return await db.run_sync(crud.mark_attendance_batch, batch)
+
+async def get_student_stats(db: AsyncSession, student_id: str):
+    return (await db.scalars(select(models.StudentCourseStats).where(models.StudentCourseStats.student_id == student_id))).all()
+
+async def get_student_course_stats(db: AsyncSession, student_id: str, course_code: str):
+    return await db.get(models.StudentCourseStats, (student_id, course_code))
+
+async def get_course_class_stats(db: AsyncSession, course_class_id: int):
+    return await db.get(models.CourseClassStats, course_class_id)
@@ -0,0 +1,158 @@
+# Password hashing and bearer tokens. Passwords are hashed with scrypt (stdlib, memory-hard) in a
+# bounded thread pool: hashlib releases the GIL while scrypt runs, so a class logging in at once
+# uses every core without stalling the event loop, and past AUTH_MAX_PENDING queued hashes logins
+# are turned away instead of piling up. A login hands out a random token kept in a cache, so
+# authenticating a request is one lookup, not a KDF run.
+#
+# AUTH_SCRYPT_N / AUTH_SCRYPT_R / AUTH_SCRYPT_P cost (default 2**14 / 8 / 1), AUTH_HASH_WORKERS
+# (default the cpu count), AUTH_MAX_PENDING, AUTH_TOKEN_TTL seconds, AUTH_TOKEN_MAXSIZE;
+# tokens live in redis when CACHE_BACKEND=redis so every worker sees them
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import cache
+
+SCRYPT_N = int(os.environ.get("AUTH_SCRYPT_N", 2 ** 14))
+SCRYPT_R = int(os.environ.get("AUTH_SCRYPT_R", 8))
+SCRYPT_P = int(os.environ.get("AUTH_SCRYPT_P", 1))
+HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", os.cpu_count() or 4))
+MAX_PENDING = int(os.environ.get("AUTH_MAX_PENDING", HASH_WORKERS * 64))
+TOKEN_TTL = int(os.environ.get("AUTH_TOKEN_TTL", 8 * 3600))
+TOKEN_MAXSIZE = int(os.environ.get("AUTH_TOKEN_MAXSIZE", 100000))
+
+Principal = namedtuple("Principal", ["user_id", "role"])
+
+
+class Busy(Exception):
+    pass
+
+
+_pool = ThreadPoolExecutor(HASH_WORKERS, thread_name_prefix="password-hash")
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _b64(raw: bytes):
+    return base64.b64encode(raw).decode().rstrip("=")
+
+def _unb64(text: str):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=2 * 128 * r * n * p + 2 ** 20, dklen=32)
+
+def _hash(password: str):
+    salt = os.urandom(16)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(_scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P))}"
+
+def _parse(stored: str):
+    # (n, r, p, salt, digest) of a hash in the scrypt format, None for anything else
+    parts = stored.split("$")
+    if len(parts) != 6 or parts[0] != "scrypt" or not all(part.isdigit() for part in parts[1:4]):
+        return None
+    try:
+        return int(parts[1]), int(parts[2]), int(parts[3]), _unb64(parts[4]), _unb64(parts[5])
+    except ValueError:
+        return None
+
+def _verify(password: str, stored: str):
+    # returns (matches, needs rehash); anything not in the scrypt format is a legacy plaintext
+    # password, even one that happens to start with "scrypt$"
+    parsed = _parse(stored)
+    if parsed is not None:
+        n, r, p, salt, digest = parsed
+        try:
+            matches = hmac.compare_digest(_scrypt(password, salt, n, r, p), digest)
+        except ValueError:
+            # parameters scrypt refuses, e.g. n not a power of two
+            parsed = None
+    if parsed is None:
+        return hmac.compare_digest(password.encode(), stored.encode()), True
+    return matches, (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+def _submit(fn, *args):
+    # admission control for the async (login) path; past MAX_PENDING the caller should back off
+    global _pending
+    with _pending_lock:
+        if _pending >= MAX_PENDING:
+            raise Busy()
+        _pending += 1
+    future = _pool.submit(fn, *args)
+    future.add_done_callback(_done)
+    return asyncio.wrap_future(future)
+
+def _done(future):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+def hash_password(password: str):
+    # blocks until the hash is done: for sync callers only, async ones await hash_password_async
+    return _pool.submit(_hash, password).result()
+
+def hash_passwords(passwords):
+    # for bulk imports: the batch is spread over the pool
+    return list(_pool.map(_hash, passwords))
+
+def verify_password(password: str, stored: str):
+    return _pool.submit(_verify, password, stored).result()
+
+async def hash_password_async(password: str):
+    return await _submit(_hash, password)
+
+async def verify_password_async(password: str, stored: str):
+    return await _submit(_verify, password, stored)
+
+# verified against when the user doesn't exist, so unknown ids take as long as wrong passwords;
+# computed in the pool at import so no request ever waits on it
+_dummy_hash = _pool.submit(_hash, secrets.token_urlsafe())
+
+
+def _token_store():
+    if isinstance(cache.backend, cache.RedisCache):
+        return cache.RedisCache(cache.backend.client, ttl=TOKEN_TTL, prefix="attendance:auth:")
+    return cache.LRUCache(maxsize=TOKEN_MAXSIZE, ttl=TOKEN_TTL)
+
+tokens = _token_store()
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+def issue_token(user_id: str, role: str):
+    token = secrets.token_urlsafe(32)
+    tokens.set(f"token:{token}", f"{time.time()}:{role}:{user_id}")
+    return token
+
+def resolve_token(token: str):
+    value = _text(tokens.get(f"token:{token}"))
+    if value is None:
+        return None
+    issued, role, user_id = value.split(":", 2)
+    revoked = _text(tokens.get(f"revoked:{user_id}"))
+    if revoked is not None and float(issued) <= float(revoked):
+        return None
+    return Principal(user_id, role)
+
+def revoke_token(token: str):
+    tokens.delete(f"token:{token}")
+
+def revoke_user(user_id: str):
+    # invalidates every token issued to the user so far; kept for as long as a token can live
+    tokens.set(f"revoked:{user_id}", str(time.time()))
+
+async def authenticate(user, password: str):
+    # user is the models.User or None; returns (matches, needs rehash)
+    if user is None:
+        await verify_password_async(password, _dummy_hash.result())
+        return False, False
+    return await verify_password_async(password, user.password)
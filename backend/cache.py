@@ -0,0 +1,171 @@
+# Read-through cache for rows that are read constantly and change rarely (users, courses, rosters).
+# Values are the rows' column values as JSON, rebuilt into ORM instances merged back into the
+# caller's session on a hit, so a hit returns an ordinary attached object without a SELECT. JSON
+# rather than pickle, since unpickling what comes back from a shared redis would run whatever code
+# was put there; password hashes are left out and load from the database when read. crud
+# invalidates keys after every write, and misses load from the primary even on a replica-routed
+# session, so a lagging replica never refills a key.
+#
+# CACHE_BACKEND=memory (default) | redis | none, CACHE_TTL seconds, CACHE_MAXSIZE entries, REDIS_URL
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from . import models
+from .routing import primary_reads
+
+# columns never written to the cache
+PRIVATE_COLUMNS = {"password"}
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 10000, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    # works with any client exposing get/set(ex=)/delete, e.g. redis.Redis or a fakeredis stub
+    def __init__(self, client, ttl: float = 300, prefix: str = "attendance:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=int(self.ttl))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def configure():
+    kind = os.environ.get("CACHE_BACKEND", "memory")
+    ttl = float(os.environ.get("CACHE_TTL", 300))
+    if kind == "none":
+        return None
+    if kind == "redis":
+        import redis
+
+        return RedisCache(redis.Redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/0")), ttl=ttl)
+    return LRUCache(maxsize=int(os.environ.get("CACHE_MAXSIZE", 10000)), ttl=ttl)
+
+
+backend = configure()
+stats = {}
+_stats_lock = threading.Lock()
+
+
+def _count(namespace: str, outcome: str):
+    with _stats_lock:
+        counters = stats.setdefault(namespace, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+def _lookup(namespace: str, key):
+    if backend is None:
+        return None
+    raw = backend.get(f"{namespace}:{key}")
+    _count(namespace, "misses" if raw is None else "hits")
+    return None if raw is None else json.loads(raw)
+
+def _store(namespace: str, key, value, encoded=None):
+    # None is never cached, so creating a row needs no invalidation to become visible
+    if backend is not None and value is not None:
+        backend.set(f"{namespace}:{key}", json.dumps(value if encoded is None else encoded))
+    return value
+
+def _row(obj):
+    columns = inspect(obj).mapper.column_attrs
+    return {"model": type(obj).__name__, "columns": {c.key: getattr(obj, c.key) for c in columns if c.key not in PRIVATE_COLUMNS}}
+
+def _rows(value):
+    if value is None:
+        return None
+    return [_row(obj) for obj in value] if isinstance(value, list) else _row(value)
+
+def _instance(row):
+    # a detached instance as if just loaded; the columns left out are expired and load when read
+    obj = getattr(models, row["model"])(**row["columns"])
+    make_transient_to_detached(obj)
+    return obj
+
+def read_through(db, namespace: str, key, load):
+    cached = _lookup(namespace, key)
+    if cached is None:
+        # misses load from the primary: the key may just have been invalidated by a write
+        with primary_reads(db):
+            value = load()
+            return _store(namespace, key, value, _rows(value))
+    if isinstance(cached, list):
+        return [db.merge(_instance(row), load=False) for row in cached]
+    return db.merge(_instance(cached), load=False)
+
+async def read_through_async(db, namespace: str, key, load):
+    cached = _lookup(namespace, key)
+    if cached is None:
+        with primary_reads(db):
+            value = await load()
+            return _store(namespace, key, value, _rows(value))
+    if isinstance(cached, list):
+        return [await db.merge(_instance(row), load=False) for row in cached]
+    return await db.merge(_instance(cached), load=False)
+
+def memoize(namespace: str, key, load):
+    # for plain values (dicts, lists of tuples) that need no session; keys carry their own version.
+    # JSON has no tuples, so the rows of a cached list come back as tuples
+    cached = _lookup(namespace, key)
+    if cached is None:
+        return _store(namespace, key, load())
+    return [tuple(row) if isinstance(row, list) else row for row in cached] if isinstance(cached, list) else cached
+
+def invalidate(namespace: str, *keys):
+    if backend is not None:
+        backend.delete(*(f"{namespace}:{key}" for key in keys))
+
+def snapshot():
+    with _stats_lock:
+        return {"backend": type(backend).__name__ if backend is not None else None, "namespaces": {k: dict(v) for k, v in stats.items()}}
@@ -1,20 +1,55 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, not_
+from datetime import datetime
 
-from . import models, schemas
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, not_, delete, func, insert, select, literal, update
+
+from . import aggregates, auth, cache, models, pagination, realtime, schemas, storage
+
+# chunk sizes for the background versions of the heavy writes: each chunk is its own transaction
+JOB_BATCH_CLASSES = 20
+JOB_BATCH_ROWS = 1000
+# classes whose cells a lazy /attendance/ page derives at a time
+PAGE_CLASSES = 20
+# the cursor of /attendance/ pages: an id, or a [course_class_id, student_id] key under lazy storage
+ATTENDANCE_CURSOR = (int, str) if storage.LAZY else None
+
+def class_conditions(course_code:str=None, date_from:datetime=None, date_to:datetime=None, **_):
+    conditions = []
+    if course_code is not None:
+        conditions.append(models.CourseClass.course_code == course_code)
+    if date_from is not None:
+        conditions.append(models.CourseClass.date_time >= date_from)
+    if date_to is not None:
+        conditions.append(models.CourseClass.date_time < date_to)
+    return conditions
+
+def attendance_source(history: bool = False, **filters):
+    # the course and date filters are also handed to lazy storage, which applies them inside its
+    # view where they narrow the derived cells, rather than after the join
+    return storage.source(history, *class_conditions(**filters))
+
+def query_entity(db: Session, entity, fields=None):
+    # the entity itself, or only the named columns as plain rows (for the fastjson routes)
+    return db.query(entity) if fields is None else db.query(*(getattr(entity, name) for name in fields))
 
 
 def get_user_by_id(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return cache.read_through(db, "user", user_id, lambda: db.query(models.User).filter(models.User.id == user_id).first())
 
-def get_all_users(db: Session):
-    return db.query(models.User).all()
+def get_all_users(db: Session, after=None, limit:int=pagination.DEFAULT_PAGE_SIZE, role:str=None, fields=None):
+    query = query_entity(db, models.User, fields)
+    if role is not None:
+        query = query.filter(models.User.role == role)
+    return pagination.paginate(query, models.User.id, after, limit)
 
 def get_users_by_role(db: Session, role:str):
     return db.query(models.User).filter(models.User.role == role).all()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    db_user = models.User(**user.model_dump())
+def create_user(db: Session, user: schemas.UserCreate, password_hash: str | None = None):
+    if password_hash is None:
+        password_hash = auth.hash_password(user.password)
+    db_user = models.User(**user.model_dump(exclude={"password"}), password=password_hash)
     db.add(db_user)
     db.flush()
     db.commit()
@@ -29,23 +64,87 @@ def create_user(db: Session, user: schemas.UserCreate):
         db.add(db_student)
         db.commit()
 
+    cache.invalidate("user", db_user.id)
     return db_user
 
 def update_user(db: Session, user: schemas.User, user_id: str):
     user_to_update = db.query(models.User).filter(models.User.id == user_id).first()
+    rosters, courses = [], []
+    if user.id != user_id:
+        # the new id cascades into enrollments and courses, so their cached copies go too
+        rosters = list(db.scalars(select(models.Enrollment.course_code).where(models.Enrollment.student_id == user_id)))
+        courses = list(db.scalars(select(models.Course.code).where(models.Course.instructor_id == user_id)))
     user_to_update.id = user.id
     user_to_update.role = user.role
     user_to_update.name = user.name
     db.flush()
     db.commit()
+    cache.invalidate("user", user_id, user.id)
+    cache.invalidate("course", *courses)
+    cache.invalidate("roster", *rosters)
+    # tokens carry the role, so they are reissued on the next login
+    auth.revoke_user(user_id)
     return user_to_update
 
+def set_password_hash(db: Session, user_id: str, password_hash: str):
+    db.execute(update(models.User).where(models.User.id == user_id).values(password=password_hash))
+    db.commit()
+    cache.invalidate("user", user_id)
+
 def delete_user(db: Session, user_id:str):
     user = db.query(models.User).filter(models.User.id==user_id).first()
+    rosters, courses = [], []
+    if user.role == "student":
+        aggregates.student_removed(db, user_id)
+        rosters = [enrollment.course_code for enrollment in get_enrollment_by_student_id(db, user_id)]
+    if user.role == "instructor":
+        courses = [course.code for course in get_course_by_instructor(db, user_id)]
+        rosters = courses
+        for course_code in courses:
+            aggregates.course_removed(db, course_code)
     # Delete the user object, triggering cascading deletes
     db.delete(user)
     db.flush()
     db.commit()
+    cache.invalidate("user", user_id)
+    auth.revoke_user(user_id)
+    cache.invalidate("course", *courses)
+    cache.invalidate("roster", *rosters)
+
+def delete_user_chunked(db: Session, user_id: str, batch_size: int = JOB_BATCH_ROWS, progress=None):
+    # the same end state as delete_user, reached in short transactions: an instructor's courses one
+    # by one, a student's attendance a batch of rows at a time, with the counters kept in step
+    user = db.query(models.User).filter(models.User.id==user_id).first()
+    if user.role == "instructor":
+        courses = [course.code for course in get_course_by_instructor(db, user_id)]
+        for done, course_code in enumerate(courses):
+            delete_course_chunked(db, course_code)
+            if progress is not None:
+                progress(done + 1, len(courses))
+    if user.role == "student":
+        if storage.LAZY:
+            # deleting stored rows would bring their cells back as derived absences while the student is
+            # enrolled, so the counters drop all of the student's cells first and the enrollments go with them
+            rosters = [enrollment.course_code for enrollment in get_enrollment_by_student_id(db, user_id)]
+            aggregates.student_removed(db, user_id)
+            db.execute(delete(models.Enrollment).where(models.Enrollment.student_id == user_id))
+            db.commit()
+            cache.invalidate("roster", *rosters)
+        total = sum(db.scalar(select(func.count()).where(table.c.student_id == user_id)) for table in aggregates.attendance_tables)
+        done = 0
+        for table in aggregates.attendance_tables:
+            while True:
+                ids = list(db.scalars(select(table.c.id).where(table.c.student_id == user_id).limit(batch_size)))
+                if not ids:
+                    break
+                if not storage.LAZY:
+                    aggregates.attendance_removed(db, table.c.id.in_(ids), attendance=table)
+                db.execute(delete(table).where(table.c.id.in_(ids)))
+                db.commit()
+                done += len(ids)
+                if progress is not None:
+                    progress(done, total)
+    delete_user(db, user_id)
 
 def get_all_instructors(db:Session):
     return db.query(models.User).filter(models.User.role=="instructor").all()
@@ -59,14 +158,20 @@ def get_all_students(db:Session):
 # def get_instructor_by_user_id(db: Session, userid:str):
 #     return db.query(models.Instructor).filter_by(user_id=userid).first()
 
-def get_all_courses(db: Session):
-    return db.query(models.Course).all()
+def get_all_courses(db: Session, after=None, limit:int=pagination.DEFAULT_PAGE_SIZE, instructor_id:str=None, fields=None):
+    query = query_entity(db, models.Course, fields)
+    if instructor_id is not None:
+        query = query.filter(models.Course.instructor_id == instructor_id)
+    return pagination.paginate(query, models.Course.code, after, limit)
 
-def get_course_by_code(db: Session, code:str):
-    return db.query(models.Course).filter(models.Course.code==code).first()
+def get_course_by_code(db: Session, code:str, options=()):
+    query = db.query(models.Course).options(*options).filter(models.Course.code==code)
+    if options:
+        return query.first()
+    return cache.read_through(db, "course", code, query.first)
 
-def get_course_by_instructor(db: Session, instructor_id:str):
-    return db.query(models.Course).filter(models.Course.instructor_id==instructor_id).all()
+def get_course_by_instructor(db: Session, instructor_id:str, options=()):
+    return db.query(models.Course).options(*options).filter(models.Course.instructor_id==instructor_id).all()
 
 def create_course(db: Session, course: schemas.CourseCreate):
     new_course = models.Course(**course.model_dump())
@@ -74,6 +179,7 @@ def create_course(db: Session, course: schemas.CourseCreate):
     db.flush()
     db.commit()
     db.refresh(new_course)
+    cache.invalidate("course", new_course.code)
     return new_course
 
 def update_course(db: Session, course: schemas.Course, course_code:str):
@@ -83,15 +189,44 @@ def update_course(db: Session, course: schemas.Course, course_code:str):
     course_to_update.instructor_id = course.instructor_id
     db.flush()
     db.commit()
+    cache.invalidate("course", course_code, course.code)
+    cache.invalidate("roster", course_code, course.code)
     return course_to_update
 
 def delete_course(db: Session, coursecode: str):
+    aggregates.course_removed(db, coursecode)
     db.delete(db.query(models.Course).filter(models.Course.code==coursecode).first())
     db.flush()
     db.commit()
+    cache.invalidate("course", coursecode)
+    cache.invalidate("roster", coursecode)
+
+def delete_course_chunked(db: Session, coursecode: str, batch_size: int = JOB_BATCH_CLASSES, progress=None):
+    # classes (and, by cascade, their attendance) go a batch at a time, then the enrollments,
+    # so no transaction holds locks on a whole course's attendance
+    class_ids = list(db.scalars(select(models.CourseClass.id).where(models.CourseClass.course_code == coursecode).order_by(models.CourseClass.id)))
+    for start in range(0, len(class_ids), batch_size):
+        chunk = class_ids[start:start + batch_size]
+        aggregates.classes_removed(db, chunk)
+        db.execute(delete(models.CourseClass).where(models.CourseClass.id.in_(chunk)))
+        db.commit()
+        if progress is not None:
+            progress(start + len(chunk), len(class_ids))
+    while True:
+        ids = list(db.scalars(select(models.Enrollment.id).where(models.Enrollment.course_code == coursecode).limit(JOB_BATCH_ROWS)))
+        if not ids:
+            break
+        db.execute(delete(models.Enrollment).where(models.Enrollment.id.in_(ids)))
+        db.commit()
+    delete_course(db, coursecode)
 
-def get_all_enrollments(db: Session):
-    return db.query(models.Enrollment).all()
+def get_all_enrollments(db: Session, after=None, limit:int=pagination.DEFAULT_PAGE_SIZE, course_code:str=None, student_id:str=None, fields=None):
+    query = query_entity(db, models.Enrollment, fields)
+    if course_code is not None:
+        query = query.filter(models.Enrollment.course_code == course_code)
+    if student_id is not None:
+        query = query.filter(models.Enrollment.student_id == student_id)
+    return pagination.paginate(query, models.Enrollment.id, after, limit)
 
 def get_enrollment_by_id(db:Session, id:str):
     return db.query(models.Enrollment).filter(models.Enrollment.id==id).first()
@@ -100,7 +235,7 @@ def get_enrollment_by_student_id(db: Session, studentid: str):
     return db.query(models.Enrollment).filter(models.Enrollment.student_id==studentid).all()
 
 def get_enrollment_by_course_code(db: Session, coursecode: str):
-    return db.query(models.Enrollment).filter(models.Enrollment.course_code==coursecode).all()
+    return cache.read_through(db, "roster", coursecode, db.query(models.Enrollment).filter(models.Enrollment.course_code==coursecode).all)
 
 def get_enrollment_by_courseandstudent(db:Session, coursecode: str, studentid:str):
     enrollments = db.query(models.Enrollment).filter(and_(models.Enrollment.course_code==coursecode, models.Enrollment.student_id==studentid)).first()
@@ -109,47 +244,178 @@ def get_enrollment_by_courseandstudent(db:Session, coursecode: str, studentid:st
 def create_enrollment(db: Session, enrollment: schemas.EnrollmentCreate):
     new_enrollment = models.Enrollment(**enrollment.model_dump())
     db.add(new_enrollment)
-    db.commit()
-    db.flush()
+    try:
+        db.commit()
+    except IntegrityError:
+        # the (course_code, student_id) unique constraint replaces a racy SELECT-then-INSERT
+        db.rollback()
+        if get_enrollment_by_courseandstudent(db, enrollment.course_code, enrollment.student_id) is None:
+            raise
+        return None
+    if storage.LAZY:
+        # the new student's cells in the course's classes are derived from here on
+        aggregates.unmarked_added(db, and_(storage.unmarked.c.student_id == enrollment.student_id, models.CourseClass.course_code == enrollment.course_code))
+        db.commit()
+    cache.invalidate("roster", enrollment.course_code)
     return new_enrollment
 
 def delete_enrollment(db: Session, enrollmentid):
-    db.delete(db.query(models.Enrollment).filter(models.Enrollment.id==enrollmentid).first())
+    enrollment = db.query(models.Enrollment).filter(models.Enrollment.id==enrollmentid).first()
+    if storage.LAZY:
+        # keep the unmarked cells as rows, the way eager storage keeps a former student's attendance
+        storage.materialize(db, models.Enrollment.id == enrollment.id)
+    db.delete(enrollment)
     db.flush()
     db.commit()
-
-def get_all_course_classes(db: Session):
-    return db.query(models.CourseClass).all()
+    cache.invalidate("roster", enrollment.course_code)
+
+def get_all_course_classes(db: Session, after=None, limit:int=pagination.DEFAULT_PAGE_SIZE, course_code:str=None, date_from:datetime=None, date_to:datetime=None, fields=None):
+    query = query_entity(db, models.CourseClass, fields)
+    if course_code is not None:
+        query = query.filter(models.CourseClass.course_code == course_code)
+    if date_from is not None:
+        query = query.filter(models.CourseClass.date_time >= date_from)
+    if date_to is not None:
+        query = query.filter(models.CourseClass.date_time < date_to)
+    return pagination.paginate(query, models.CourseClass.id, after, limit)
 
 def get_course_class_by_id(db: Session, id:str):
-    return db.query(models.CourseClass).filter(models.CourseClass.id==id)
+    return db.query(models.CourseClass).filter(models.CourseClass.id==id).first()
 
-def get_course_class_by_course_code(db:Session, coursecode: str):
-    return db.query(models.CourseClass).filter(models.CourseClass.course_code==coursecode)
+def get_course_class_by_course_code(db:Session, coursecode: str, options=()):
+    return db.query(models.CourseClass).options(*options).filter(models.CourseClass.course_code==coursecode).all()
 
-def create_course_class(db: Session, course_class=schemas.CourseClassCreate):
+def create_course_class(db: Session, course_class: schemas.CourseClassCreate, seed: bool = True):
     new_course_class = models.CourseClass(**course_class.model_dump())
     db.add(new_course_class)
     db.flush()
+    if storage.LAZY:
+        # nothing to store: the class's cells are derived from the roster until they are marked
+        aggregates.unmarked_added(db, storage.unmarked.c.course_class_id == new_course_class.id)
+        db.commit()
+        return new_course_class
+    if not seed:
+        # attendance is left to seed_course_class, e.g. from a background job
+        db.commit()
+        return new_course_class
+    # seed one absent row per enrolled student with a single INSERT ... SELECT
+    seed = select(models.Enrollment.student_id, literal(new_course_class.id), literal(False)).where(models.Enrollment.course_code == new_course_class.course_code)
+    db.execute(insert(models.Attendance).from_select(["student_id", "course_class_id", "present"], seed))
+    aggregates.classes_seeded(db, [new_course_class.id])
     db.commit()
     return new_course_class
 
+def seed_course_class(db: Session, class_id: int, batch_size: int = JOB_BATCH_ROWS, progress=None):
+    # chunked, resumable version of the seeding in create_course_class: one transaction per batch
+    # of enrollments, skipping students who already have a row, live or archived
+    if storage.LAZY:
+        return 0
+    course_code = db.scalar(select(models.CourseClass.course_code).where(models.CourseClass.id == class_id))
+    total = db.scalar(select(func.count()).where(models.Enrollment.course_code == course_code))
+    after, done, seen = 0, 0, 0
+    while True:
+        batch = db.execute(
+            select(models.Enrollment.id, models.Enrollment.student_id)
+            .where(models.Enrollment.course_code == course_code, models.Enrollment.id > after)
+            .order_by(models.Enrollment.id).limit(batch_size)
+        ).all()
+        if not batch:
+            return done
+        after = batch[-1].id
+        seen += len(batch)
+        students = [row.student_id for row in batch]
+        existing = set()
+        for table in aggregates.attendance_tables:
+            existing.update(db.scalars(select(table.c.student_id).where(table.c.course_class_id == class_id, table.c.student_id.in_(students))))
+        new = [student_id for student_id in students if student_id not in existing]
+        if new:
+            db.execute(insert(models.Attendance), [{"student_id": student_id, "course_class_id": class_id, "present": False} for student_id in new])
+            aggregates.attendance_added(db, and_(models.Attendance.course_class_id == class_id, models.Attendance.student_id.in_(new)))
+        db.commit()
+        done += len(new)
+        if progress is not None:
+            progress(seen, total)
+
 def delete_course_class(db: Session, class_id):
+    aggregates.class_removed(db, class_id)
     db.delete(db.query(models.CourseClass).filter(models.CourseClass.id==class_id).first())
     db.flush()
     db.commit()
 
-def get_all_attendance(db: Session):
-    return db.query(models.Attendance).all()
-
-def get_attendance_by_id(db:Session, id:str):
+def filter_attendance(query, course_code:str=None, course_class_id:int=None, student_id:str=None, date_from:datetime=None, date_to:datetime=None, joined:bool=False, source=models.Attendance):
+    conditions = class_conditions(course_code, date_from, date_to)
+    if not joined and conditions:
+        query = query.join(models.CourseClass, models.CourseClass.id == source.course_class_id)
+    query = query.filter(*conditions)
+    if course_class_id is not None:
+        query = query.filter(source.course_class_id == course_class_id)
+    if student_id is not None:
+        query = query.filter(source.student_id == student_id)
+    return query
+
+def get_all_attendance(db: Session, after=None, limit:int=pagination.DEFAULT_PAGE_SIZE, history:bool=False, fields=None, **filters):
+    if storage.LAZY:
+        return get_all_attendance_cells(db, after, limit, history, fields, **filters)
+    source = attendance_source(history, **filters)
+    query = filter_attendance(query_entity(db, source, fields), source=source, **filters)
+    return pagination.paginate(query, source.id, after, limit)
+
+def get_all_attendance_cells(db: Session, after, limit:int, history:bool, fields, **filters):
+    # lazy storage pages on (course_class_id, student_id): an unmarked cell's virtual id changes when
+    # it is marked, which would move it across the cursor. The cells are derived a window of classes
+    # at a time, so a page costs the same wherever it starts rather than sorting enrollments x classes
+    # of the whole table; a student's cells are few enough to derive in one go
+    conditions = class_conditions(**filters)
+    classes = select(models.CourseClass.id).where(*conditions).order_by(models.CourseClass.id).limit(PAGE_CLASSES)
+    if filters.get("course_class_id") is not None:
+        classes = classes.where(models.CourseClass.id == filters["course_class_id"])
+    if after is not None:
+        classes = classes.where(models.CourseClass.id >= after[0])
+    one_student = filters.get("student_id") is not None
+    rows = []
+    while len(rows) <= limit:
+        window = conditions
+        if not one_student:
+            class_ids = list(db.scalars(classes))
+            if not class_ids:
+                break
+            window = [*conditions, models.CourseClass.id.between(class_ids[0], class_ids[-1])]
+            classes = classes.where(models.CourseClass.id > class_ids[-1])
+        source = storage.source(history, *window)
+        query = filter_attendance(query_entity(db, source, fields), source=source, **filters)
+        rows += pagination.seek(query, (source.course_class_id, source.student_id), after).limit(limit + 1 - len(rows)).all()
+        if one_student:
+            break
+    return pagination.page(rows, limit, lambda row: [row.course_class_id, row.student_id])
+
+def stream_attendance(db: Session, batch_size:int=1000, history:bool=False, **filters):
+    source = attendance_source(history, **filters)
+    query = (
+        db.query(source.id, source.student_id, source.course_class_id,
+                 models.CourseClass.course_code, models.CourseClass.date_time, source.present)
+        .join(models.CourseClass, models.CourseClass.id == source.course_class_id)
+    )
+    # yield_per switches to a server-side cursor so rows are fetched batch by batch, never all at once
+    return filter_attendance(query, joined=True, source=source, **filters).order_by(source.id).yield_per(batch_size)
+
+def get_attendance_by_id(db:Session, id:int):
+    if id < 0:
+        # a virtual id: the cell's stored row if it has been marked since, else the derived cell
+        cell = storage.resolve(db, id)
+        if cell is None:
+            return None
+        course_class_id, student_id = cell
+        source = attendance_source()
+        return db.query(source).filter(source.course_class_id==course_class_id, source.student_id==student_id).first()
     return db.query(models.Attendance).filter(models.Attendance.id==id).first()
 
-def get_attendance_by_student_id(db:Session, studentid: str):
-    return db.query(models.Attendance).filter(models.Attendance.student_id==studentid).all()
+def get_attendance_by_student_id(db:Session, studentid: str, history:bool=False):
+    source = attendance_source(history)
+    return db.query(source).filter(source.student_id==studentid).all()
 
-def get_attendance_by_course_class_id(db: Session, courseclassid: str):
-    return db.query(models.Attendance).filter(models.Attendance.course_class_id==courseclassid).all()
+def get_attendance_by_course_class_id(db: Session, courseclassid: str, history:bool=False):
+    source = attendance_source(history)
+    return db.query(source).filter(source.course_class_id==courseclassid).all()
 
 def create_attendance(db: Session, attendance: schemas.AttendanceCreate):
     new_attendance =  models.Attendance(student_id = attendance.student_id, course_class_id = attendance.course_class_id, present = False)
@@ -158,14 +424,69 @@ def create_attendance(db: Session, attendance: schemas.AttendanceCreate):
     db.commit()
     return new_attendance
 
-def update_attendance(db: Session, attendanceid: str, present:bool):
-    attendance_to_update = db.query(models.Attendance).filter(models.Attendance.id==attendanceid).first()
+def update_attendance(db: Session, attendanceid: int, present:bool):
+    if attendanceid < 0:
+        course_class_id, student_id = storage.resolve(db, attendanceid)
+        storage.materialize(db, models.CourseClass.id == course_class_id, models.Enrollment.student_id == student_id)
+        attendanceid = db.scalar(select(models.Attendance.id).where(models.Attendance.course_class_id == course_class_id, models.Attendance.student_id == student_id))
+    attendance_to_update = db.query(models.Attendance).filter(models.Attendance.id==attendanceid).with_for_update().first()
+    changed = attendance_to_update.present != present
+    if changed:
+        aggregates.marks_changed(db, attendance_to_update.course_class_id, {attendance_to_update.student_id: present})
     attendance_to_update.present = present
     db.flush()
     db.commit()
+    if changed:
+        realtime.publish_marks(attendance_to_update.course_class_id, [
+            {"attendance_id": attendance_to_update.id, "student_id": attendance_to_update.student_id, "present": present}])
     return attendance_to_update
 
+def mark_attendance_batch(db: Session, batch: schemas.AttendanceBatchUpdate):
+    if storage.LAZY:
+        # the cells about to be marked get their rows first
+        students = [] if batch.all_present_except is not None else [models.Enrollment.student_id.in_([*batch.present, *batch.absent])]
+        storage.materialize(db, models.CourseClass.id == batch.course_class_id, *students)
+    rows = db.query(models.Attendance.id, models.Attendance.student_id, models.Attendance.present).filter(models.Attendance.course_class_id==batch.course_class_id).with_for_update()
+    if batch.all_present_except is None:
+        wanted = {student_id: True for student_id in batch.present}
+        wanted.update({student_id: False for student_id in batch.absent})
+        rows = rows.filter(models.Attendance.student_id.in_(wanted)).all()
+    else:
+        rows = rows.all()
+        excepted = set(batch.all_present_except)
+        wanted = {row.student_id: row.student_id not in excepted for row in rows}
+        wanted.update({student_id: False for student_id in excepted})
+    current = {row.student_id: row for row in rows}
+
+    results = []
+    changes = {True: [], False: []}
+    flipped = {}
+    for student_id, present in wanted.items():
+        row = current.get(student_id)
+        if row is None:
+            results.append({"student_id": student_id, "status": "not_found"})
+            continue
+        if row.present == present:
+            status = "unchanged"
+        else:
+            status = "updated"
+            changes[present].append(row.id)
+            flipped[student_id] = present
+        results.append({"student_id": student_id, "attendance_id": row.id, "present": present, "status": status})
+
+    # the present != value guard keeps a retried or racing batch from re-applying a mark
+    for present, ids in changes.items():
+        if ids:
+            db.execute(update(models.Attendance).where(models.Attendance.id.in_(ids), models.Attendance.present != present).values(present=present))
+    aggregates.marks_changed(db, batch.course_class_id, flipped)
+    db.commit()
+    realtime.publish_marks(batch.course_class_id, [
+        {"attendance_id": result["attendance_id"], "student_id": result["student_id"], "present": result["present"]}
+        for result in results if result["status"] == "updated"])
+    return results
+
 def delete_attendance(db: Session, attendanceid: str):
-    db.delete(db.query(models.Attendance).filter_by(models.Attendance.id==attendanceid).first())
+    aggregates.attendance_removed(db, models.Attendance.id==attendanceid)
+    db.delete(db.query(models.Attendance).filter(models.Attendance.id==attendanceid).first())
     db.flush()
     db.commit()
\ No newline at end of file
@@ -0,0 +1,46 @@
+import csv
+import io
+import json
+
+from . import crud
+from .database import ReadSessionLocal
+
+COLUMNS = ["id", "student_id", "course_class_id", "course_code", "date_time", "present"]
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+CHUNK_ROWS = 1000
+
+
+def _json_default(value):
+    return value.isoformat()
+
+def ndjson_chunks(rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(COLUMNS, row)), default=_json_default))
+        if len(lines) == CHUNK_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+def csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_attendance(format: str, **filters):
+    # the generator owns its session: the request's get_db session is closed before the body streams
+    db = ReadSessionLocal()
+    try:
+        rows = crud.stream_attendance(db, **filters)
+        chunks = ndjson_chunks if format == "ndjson" else csv_chunks
+        yield from chunks(rows)
+    finally:
+        db.close()
@@ -0,0 +1,170 @@
+# Bulk import of users, courses and enrollments from CSV or NDJSON. Rows are read as a stream,
+# validated with the API schemas and written in batches of multi-row INSERTs, one transaction per
+# batch; bad rows are reported by line number and skipped instead of aborting the file.
+#
+# run "python -m backend.importer users|courses|enrollments <file.csv|file.ndjson>"
+
+import csv
+import io
+import json
+import sys
+
+from pydantic import ValidationError
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import aggregates, auth, cache, models, schemas, storage
+
+BATCH_SIZE = 1000
+ROLES = ("admin", "instructor", "student")
+SCHEMAS = {"users": schemas.UserCreate, "courses": schemas.CourseCreate, "enrollments": schemas.EnrollmentCreate}
+
+
+def read_rows(lines, format: str):
+    # yields (line number, dict or None, parse error)
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except ValueError as e:
+            yield line_number, None, f"invalid json: {e}"
+
+def _check_users(db: Session, batch, seen):
+    ids = [user.id for _, user in batch]
+    existing = set(db.scalars(select(models.User.id).where(models.User.id.in_(ids))))
+    for line, user in batch:
+        if user.role not in ROLES:
+            yield line, f"unknown role {user.role}"
+        elif user.id in existing or user.id in seen:
+            yield line, f"user {user.id} already exists"
+        else:
+            seen.add(user.id)
+            yield line, None
+
+def _insert_users(db: Session, users):
+    hashes = auth.hash_passwords([user.password for user in users])
+    db.execute(insert(models.User), [{**user.model_dump(), "password": password_hash} for user, password_hash in zip(users, hashes)])
+    instructors = [{"user_id": user.id} for user in users if user.role == "instructor"]
+    students = [{"user_id": user.id} for user in users if user.role == "student"]
+    if instructors:
+        db.execute(insert(models.Instructor), instructors)
+    if students:
+        db.execute(insert(models.Student), students)
+
+def _check_courses(db: Session, batch, seen):
+    codes = [course.code for _, course in batch]
+    existing = set(db.scalars(select(models.Course.code).where(models.Course.code.in_(codes))))
+    instructors = set(db.scalars(select(models.Instructor.user_id).where(models.Instructor.user_id.in_({c.instructor_id for _, c in batch}))))
+    for line, course in batch:
+        if course.code in existing or course.code in seen:
+            yield line, f"course {course.code} already exists"
+        elif course.instructor_id not in instructors:
+            yield line, f"instructor {course.instructor_id} not found"
+        else:
+            seen.add(course.code)
+            yield line, None
+
+def _insert_courses(db: Session, courses):
+    db.execute(insert(models.Course), [course.model_dump() for course in courses])
+
+def _check_enrollments(db: Session, batch, seen):
+    codes = {e.course_code for _, e in batch}
+    student_ids = {e.student_id for _, e in batch}
+    existing = set(db.execute(
+        select(models.Enrollment.course_code, models.Enrollment.student_id)
+        .where(models.Enrollment.course_code.in_(codes), models.Enrollment.student_id.in_(student_ids))
+    ).tuples())
+    courses = set(db.scalars(select(models.Course.code).where(models.Course.code.in_(codes))))
+    students = set(db.scalars(select(models.Student.user_id).where(models.Student.user_id.in_(student_ids))))
+    for line, enrollment in batch:
+        key = (enrollment.course_code, enrollment.student_id)
+        if key in existing or key in seen:
+            yield line, f"{enrollment.student_id} already enrolled in {enrollment.course_code}"
+        elif enrollment.course_code not in courses:
+            yield line, f"course {enrollment.course_code} not found"
+        elif enrollment.student_id not in students:
+            yield line, f"student {enrollment.student_id} not found"
+        else:
+            seen.add(key)
+            yield line, None
+
+def _insert_enrollments(db: Session, enrollments):
+    db.execute(insert(models.Enrollment), [enrollment.model_dump() for enrollment in enrollments])
+    if storage.LAZY:
+        aggregates.unmarked_added(db, or_(*(
+            and_(storage.unmarked.c.student_id == enrollment.student_id, models.CourseClass.course_code == enrollment.course_code)
+            for enrollment in enrollments)))
+    cache.invalidate("roster", *{enrollment.course_code for enrollment in enrollments})
+
+CHECKS = {"users": _check_users, "courses": _check_courses, "enrollments": _check_enrollments}
+INSERTS = {"users": _insert_users, "courses": _insert_courses, "enrollments": _insert_enrollments}
+
+
+def _flush(db: Session, kind: str, batch, seen, report):
+    valid = []
+    for (line, item), (_, error) in zip(batch, CHECKS[kind](db, batch, seen)):
+        if error is None:
+            valid.append((line, item))
+        else:
+            report["errors"].append({"line": line, "error": error})
+    if not valid:
+        return
+    try:
+        INSERTS[kind](db, [item for _, item in valid])
+        db.commit()
+        report["inserted"] += len(valid)
+    except IntegrityError as e:
+        # a row raced in since the checks ran; report the batch rather than guess which row
+        db.rollback()
+        report["errors"].extend({"line": line, "error": f"batch rejected: {e.orig}"} for line, _ in valid)
+
+def import_rows(db: Session, kind: str, rows, batch_size: int = BATCH_SIZE, progress=None):
+    schema = SCHEMAS[kind]
+    report = {"inserted": 0, "errors": []}
+    batch, seen = [], set()
+    for line, row, error in rows:
+        if error is None:
+            try:
+                batch.append((line, schema.model_validate(row)))
+            except ValidationError as e:
+                error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+        if error is not None:
+            report["errors"].append({"line": line, "error": error})
+        if len(batch) == batch_size:
+            _flush(db, kind, batch, seen, report)
+            batch = []
+            if progress is not None:
+                progress(report)
+    if batch:
+        _flush(db, kind, batch, seen, report)
+    report["errors"].sort(key=lambda error: error["line"])
+    return report
+
+def import_file(db: Session, kind: str, binary_file, format: str, **kwargs):
+    lines = io.TextIOWrapper(binary_file, encoding="utf-8", newline="")
+    return import_rows(db, kind, read_rows(lines, format), **kwargs)
+
+def format_for(filename: str | None):
+    return "csv" if filename and filename.lower().endswith(".csv") else "ndjson"
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    kind, path = sys.argv[1], sys.argv[2]
+    db = SessionLocal()
+    try:
+        with open(path, "rb") as f:
+            report = import_file(db, kind, f, format_for(path), progress=lambda r: print(f"{r['inserted']} inserted", file=sys.stderr))
+    finally:
+        db.close()
+    for error in report["errors"]:
+        print(f"line {error['line']}: {error['error']}")
+    print(f"{report['inserted']} {kind} imported, {len(report['errors'])} row(s) rejected")
@@ -0,0 +1,193 @@
+# Background jobs for the heavy writes (cascading deletes, class seeding, schedules, imports). A route
+# submits a job and answers 202 with its id straight away; a small worker pool runs it with its
+# own session, in the chunked versions of the crud functions, and records progress and the
+# result for GET /jobs/{id} and GET /jobs/{id}/result.
+#
+# JOBS_BACKEND=memory (default) | sqlite, which keeps jobs in a local file (JOBS_SQLITE_PATH) so
+# queued and interrupted ones are picked up again on restart; JOBS_WORKERS (default 2) bounds how
+# many run at once, and with them how many DB connections jobs take; JOBS_RETENTION finished jobs are kept
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from . import crud, importer, schedule, schemas
+from .database import SessionLocal
+
+WORKERS = int(os.environ.get("JOBS_WORKERS", 2))
+RETENTION = int(os.environ.get("JOBS_RETENTION", 1000))
+SPOOL_DIR = os.environ.get("JOBS_SPOOL_DIR", tempfile.gettempdir())
+FIELDS = ["id", "kind", "args", "status", "done", "total", "result", "error", "created_at", "started_at", "finished_at"]
+
+log = logging.getLogger("backend.jobs")
+
+
+class MemoryJobStore:
+    def __init__(self, retention: int = RETENTION):
+        self.retention = retention
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, job: dict):
+        with self._lock:
+            self._jobs[job["id"]] = job
+            finished = [job_id for job_id, j in self._jobs.items() if j["finished_at"] is not None]
+            for job_id in finished[:max(0, len(finished) - self.retention)]:
+                del self._jobs[job_id]
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def unfinished(self):
+        # nothing outlives the process
+        return []
+
+
+class SqliteJobStore:
+    def __init__(self, path: str, retention: int = RETENTION):
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, kind TEXT, args TEXT, status TEXT, done INTEGER, total INTEGER,"
+            " result TEXT, error TEXT, created_at REAL, started_at REAL, finished_at REAL)"
+        )
+
+    def _row(self, row):
+        job = dict(zip(FIELDS, row))
+        job["args"] = json.loads(job["args"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def add(self, job: dict):
+        values = {**job, "args": json.dumps(job["args"]), "result": None}
+        with self._lock:
+            self._conn.execute(f"INSERT INTO jobs VALUES ({', '.join('?' for _ in FIELDS)})", [values[f] for f in FIELDS])
+            self._conn.execute(
+                "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT -1 OFFSET ?)",
+                (self.retention,))
+
+    def update(self, job_id: str, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?", [*fields.values(), job_id])
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row is not None else None
+
+    def unfinished(self):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(FIELDS)} FROM jobs WHERE finished_at IS NULL ORDER BY created_at").fetchall()
+        return [self._row(row) for row in rows]
+
+
+handlers = {}
+
+
+def handler(kind: str):
+    # handlers take (db, progress, **args) and return something JSON-serialisable; they must be
+    # safe to run again from the start, since an interrupted job is rerun on restart
+    def register(fn):
+        handlers[kind] = fn
+        return fn
+    return register
+
+
+class JobQueue:
+    def __init__(self, store, workers: int = WORKERS):
+        self.store = store
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="job")
+
+    def submit(self, kind: str, /, **args):
+        job = {"id": uuid.uuid4().hex, "kind": kind, "args": args, "status": "queued", "done": 0, "total": None,
+               "result": None, "error": None, "created_at": time.time(), "started_at": None, "finished_at": None}
+        self.store.add(job)
+        self._pool.submit(self._run, job["id"], kind, args)
+        return job["id"]
+
+    def recover(self):
+        for job in self.store.unfinished():
+            self.store.update(job["id"], status="queued")
+            self._pool.submit(self._run, job["id"], job["kind"], job["args"])
+
+    def _run(self, job_id: str, kind: str, args: dict):
+        self.store.update(job_id, status="running", started_at=time.time())
+        db = SessionLocal()
+        try:
+            result = handlers[kind](db, lambda done, total: self.store.update(job_id, done=done, total=total), **args)
+            self.store.update(job_id, status="succeeded", result=result, finished_at=time.time())
+        except Exception as e:
+            db.rollback()
+            log.exception("job %s (%s) failed", job_id, kind)
+            self.store.update(job_id, status="failed", error=f"{type(e).__name__}: {e}", finished_at=time.time())
+        finally:
+            db.close()
+
+
+def configure():
+    if os.environ.get("JOBS_BACKEND", "memory") == "sqlite":
+        return SqliteJobStore(os.environ.get("JOBS_SQLITE_PATH", "./jobs.db"))
+    return MemoryJobStore()
+
+
+queue = JobQueue(configure())
+
+
+def spool(binary_file, suffix: str = ""):
+    # uploads are copied to disk so the job can read them after the request has finished
+    with tempfile.NamedTemporaryFile(delete=False, dir=SPOOL_DIR, prefix="job-", suffix=suffix) as f:
+        shutil.copyfileobj(binary_file, f)
+        return f.name
+
+
+@handler("delete_course")
+def _delete_course(db, progress, course_code: str):
+    if crud.get_course_by_code(db, course_code) is not None:
+        crud.delete_course_chunked(db, course_code, progress=progress)
+    return {"course_code": course_code, "deleted": True}
+
+@handler("delete_user")
+def _delete_user(db, progress, user_id: str):
+    if crud.get_user_by_id(db, user_id) is not None:
+        crud.delete_user_chunked(db, user_id, progress=progress)
+    return {"user_id": user_id, "deleted": True}
+
+@handler("seed_course_class")
+def _seed_course_class(db, progress, course_class_id: int):
+    return {"course_class_id": course_class_id, "seeded": crud.seed_course_class(db, course_class_id, progress=progress)}
+
+@handler("schedule")
+def _schedule(db, progress, **rule):
+    rule = schemas.ScheduleCreate(**rule)
+    report = schedule.create(db, rule, progress=progress)
+    if rule.seed == "lazy":
+        report["attendance_seeded"] = schedule.seed_pending(db, rule)
+    return report
+
+@handler("seed_schedule")
+def _seed_schedule(db, progress, **rule):
+    return {"attendance_seeded": schedule.seed_pending(db, schemas.ScheduleCreate(**rule), progress=progress)}
+
+@handler("import")
+def _import(db, progress, kind: str, path: str, format: str):
+    with open(path, "rb") as f:
+        report = importer.import_file(db, kind, f, format, progress=lambda r: progress(r["inserted"] + len(r["errors"]), None))
+    os.remove(path)
+    return report
@@ -0,0 +1,71 @@
+# Relationship loading for the nested response schemas. Each tree maps a schema's nested field to
+# the relationship behind it; routes turn the client's ?expand= paths into selectinload options for
+# what was asked for and raiseload for the rest, then drop the unexpanded fields from the output.
+
+from typing import get_args
+
+from sqlalchemy.orm import raiseload, selectinload
+
+from . import models, storage
+
+COURSE = {
+    "enrollments": (models.Course.enrollments, {}),
+    "course_classes": (models.Course.course_classes, {"attendance": (storage.class_attendance(), {})}),
+}
+COURSE_CLASS = {"attendance": (storage.class_attendance(), {})}
+
+
+def paths(tree, prefix=""):
+    for name, (_, children) in tree.items():
+        yield prefix + name
+        yield from paths(children, f"{prefix}{name}.")
+
+def parse_expand(expand: str | None, tree):
+    requested = {path.strip() for path in expand.split(",") if path.strip()} if expand else set()
+    unknown = requested - set(paths(tree))
+    if unknown:
+        raise ValueError(f"cannot expand {', '.join(sorted(unknown))}")
+    # expanding a.b implies a
+    return requested | {".".join(path.split(".")[:depth]) for path in requested for depth in range(1, path.count(".") + 1)}
+
+def options(tree, expand, prefix="", parent=None):
+    loaders = []
+    for name, (attribute, children) in tree.items():
+        path = prefix + name
+        if path in expand:
+            loader = selectinload(attribute) if parent is None else parent.selectinload(attribute)
+            loaders.append(loader)
+            loaders.extend(options(children, expand, f"{path}.", loader))
+        else:
+            loaders.append(raiseload(attribute) if parent is None else parent.raiseload(attribute))
+    return loaders
+
+def exclude(tree, expand, prefix=""):
+    excluded = {}
+    for name, (_, children) in tree.items():
+        path = prefix + name
+        if path not in expand:
+            excluded[name] = True
+        else:
+            nested = exclude(children, expand, f"{path}.")
+            if nested:
+                excluded[name] = {"__all__": nested}
+    return excluded
+
+def _fields(obj, schema, tree, expand, prefix=""):
+    # the schema's input read off obj without touching the relationships left unloaded, which raise;
+    # relationships go under the attribute's name, which is the field's validation alias
+    data = {}
+    for name, field in schema.model_fields.items():
+        if name not in tree:
+            data[name] = getattr(obj, name)
+            continue
+        attribute, children = tree[name]
+        path = prefix + name
+        if path in expand:
+            nested = get_args(field.annotation)[0]
+            data[attribute.key] = [_fields(child, nested, children, expand, f"{path}.") for child in getattr(obj, attribute.key)]
+    return data
+
+def dump(obj, schema, tree, expand):
+    return schema.model_validate(_fields(obj, schema, tree, expand)).model_dump(mode="json", exclude=exclude(tree, expand))
@@ -1,13 +1,23 @@
-from fastapi import Depends, FastAPI, HTTPException
+from datetime import datetime
+from typing import Annotated, Literal
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Response, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from . import crud, models, schemas
-from .database import SessionLocal, engine
+from . import analytics, async_crud, auth, cache, crud, export, fastjson, importer, jobs, loading, matrix, metrics, models, pagination, realtime, schedule, schemas, storage
+from .database import ReadSessionLocal, SessionLocal, engine, get_async_read_sessionmaker, get_async_sessionmaker
 
 models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI()
 
+metrics.instrument()
+app.middleware("http")(metrics.middleware)
+jobs.queue.recover()
+
 
 # Dependency
 def get_db():
@@ -17,6 +27,78 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+# for the read routes: a replica when one is configured and healthy, the primary once the session writes
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    async with get_async_read_sessionmaker()() as db:
+        yield db
+
+
+PageSize = Annotated[int, Query(ge=1, le=pagination.MAX_PAGE_SIZE)]
+
+def parse_expand(expand: str | None, tree):
+    try:
+        return loading.parse_expand(expand, tree)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def decode_cursor(cursor: str | None, composite: tuple | None = None):
+    try:
+        return pagination.decode_cursor(cursor, composite)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def accepted(job_id: str, **extra):
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status_url": f"/jobs/{job_id}", **extra})
+
+bearer = HTTPBearer(auto_error=False)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials | None = Depends(bearer)):
+    # a token cache lookup, no password hashing
+    principal = auth.resolve_token(credentials.credentials) if credentials is not None else None
+    if principal is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return principal
+
+
+@app.post("/auth/login", response_model=schemas.Token)
+async def login(credentials: schemas.Login, db: AsyncSession = Depends(get_async_db)):
+    user = await async_crud.get_user_with_password(db, credentials.id)
+    # hand the connection back to the pool while the password is checked
+    await db.close()
+    try:
+        matches, rehash = await auth.authenticate(user, credentials.password)
+    except auth.Busy:
+        raise HTTPException(status_code=503, detail="Too many logins in progress", headers={"Retry-After": "1"})
+    if not matches:
+        raise HTTPException(status_code=401, detail="Invalid id or password")
+    if rehash:
+        # legacy plaintext or an older cost: store a hash at the current settings, unless the pool
+        # is saturated, in which case a later login does it
+        try:
+            await async_crud.set_password_hash(db, user.id, await auth.hash_password_async(credentials.password))
+        except auth.Busy:
+            pass
+    return {"access_token": auth.issue_token(user.id, user.role), "expires_in": auth.TOKEN_TTL}
+
+@app.post("/auth/logout")
+async def logout(credentials: HTTPAuthorizationCredentials | None = Depends(bearer), principal: auth.Principal = Depends(get_current_user)):
+    auth.revoke_token(credentials.credentials)
+    return {"detail": "Logged out"}
+
+@app.get("/auth/me", response_model=schemas.Principal)
+async def read_current_user(principal: auth.Principal = Depends(get_current_user)):
+    return principal._asdict()
 
 @app.post("/users/", response_model=schemas.User)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
@@ -26,14 +108,15 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return crud.create_user(db=db, user=user)
 
 
-@app.get("/users/", response_model=list[schemas.User])
-def read_users(db: Session = Depends(get_db)):
-    users = crud.get_all_users(db)
-    return users
+@app.get("/users/", response_model=schemas.Page[schemas.User])
+def read_users(cursor: str | None = None, limit: PageSize = pagination.DEFAULT_PAGE_SIZE, role: str | None = None, db: Session = Depends(get_read_db)):
+    fields = fastjson.fields("read_users", schemas.User)
+    users = crud.get_all_users(db, after=decode_cursor(cursor), limit=limit, role=role, fields=fields)
+    return users if fields is None else fastjson.page(users, fields)
 
 
 @app.get("/users/{user_id}", response_model=schemas.User)
-def read_user(user_id: str, db: Session = Depends(get_db)):
+def read_user(user_id: str, db: Session = Depends(get_read_db)):
     db_user = crud.get_user_by_id(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -46,21 +129,23 @@ def update_user(user_id:str, user: schemas.User, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
     return crud.update_user(db, user, user_id)
 
-@app.delete("/users/{user_id}")
-def delete_user(user_id: str, db: Session = Depends(get_db)):
+@app.delete("/users/{user_id}", responses={202: {"model": schemas.JobAccepted}})
+def delete_user(user_id: str, background: bool = False, db: Session = Depends(get_db)):
     db_user = crud.get_user_by_id(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    if background:
+        return accepted(jobs.queue.submit("delete_user", user_id=user_id))
     crud.delete_user(db=db, user_id=user_id)
     return {"detail": "User deleted successfully"}
 
 @app.get("/users/instructors/")
-def read_instructors(db: Session = Depends(get_db)):
+def read_instructors(db: Session = Depends(get_read_db)):
     instructors =  crud.get_all_instructors(db)
     return instructors
 
 @app.get("/users/students/")
-def read_students(db: Session = Depends(get_db)):
+def read_students(db: Session = Depends(get_read_db)):
     students = crud.get_all_students(db)
     return students
 
@@ -71,51 +156,79 @@ def create_course(course: schemas.CourseCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="course already exists")
     return crud.create_course(db=db, course=course)
 
-@app.get("/courses")
-def read_courses(db: Session = Depends(get_db)):
-    return crud.get_all_courses(db)
+@app.get("/courses", response_model=schemas.Page[schemas.CourseBase])
+def read_courses(cursor: str | None = None, limit: PageSize = pagination.DEFAULT_PAGE_SIZE, instructor_id: str | None = None, db: Session = Depends(get_read_db)):
+    fields = fastjson.fields("read_courses", schemas.CourseBase)
+    courses = crud.get_all_courses(db, after=decode_cursor(cursor), limit=limit, instructor_id=instructor_id, fields=fields)
+    return courses if fields is None else fastjson.page(courses, fields)
 
 @app.get("/courses/code/{code}")
-def read_courses_by_code(code:str, db: Session = Depends(get_db)):
-    return crud.get_course_by_code(db, code)
+def read_courses_by_code(code:str, expand: str | None = None, db: Session = Depends(get_read_db)):
+    expand = parse_expand(expand, loading.COURSE)
+    course = crud.get_course_by_code(db, code, options=loading.options(loading.COURSE, expand))
+    if course is None:
+        return None
+    return loading.dump(course, schemas.Course, loading.COURSE, expand)
 
 @app.get("/courses/instructor/{instructor_id}")
-def read_courses_by_instructor(instructor_id:str, db: Session = Depends(get_db)):
-    return crud.get_course_by_instructor(db, instructor_id)
+def read_courses_by_instructor(instructor_id:str, expand: str | None = None, db: Session = Depends(get_read_db)):
+    expand = parse_expand(expand, loading.COURSE)
+    courses = crud.get_course_by_instructor(db, instructor_id, options=loading.options(loading.COURSE, expand))
+    return [loading.dump(course, schemas.Course, loading.COURSE, expand) for course in courses]
 
 @app.put("/courses/{course_code}", response_model=schemas.Course)
 def update_course(course_code:str, course: schemas.Course, db: Session = Depends(get_db)):
     db_course = crud.get_course_by_code(db, code=course_code)
     if db_course is None:
         raise HTTPException(status_code=404, detail="Course not found")
-    return crud.update_course(db, course, course_code)
+    db_course = crud.update_course(db, course, course_code)
+    # the response nests every relationship, so load them all up front instead of one query per class
+    expand = set(loading.paths(loading.COURSE))
+    return crud.get_course_by_code(db, db_course.code, options=loading.options(loading.COURSE, expand))
 
-@app.delete("/courses/{course_code}")
-def delete_course(course_code:str, db:Session = Depends(get_db)):
+@app.delete("/courses/{course_code}", responses={202: {"model": schemas.JobAccepted}})
+def delete_course(course_code:str, background: bool = False, db:Session = Depends(get_db)):
     db_course = crud.get_course_by_code(db, code=course_code)
     if db_course is None:
         raise HTTPException(status_code=404, detail="Course not found")
+    if background:
+        return accepted(jobs.queue.submit("delete_course", course_code=course_code))
     crud.delete_course(db=db, coursecode=course_code)
     return {"detail": "Course deleted successfully"}
 
+@app.get("/courses/{course_code}/attendance_matrix", response_model=schemas.AttendanceMatrix)
+def read_attendance_matrix(course_code: str, response: Response, history: bool = False, if_none_match: str | None = Header(None), db: Session = Depends(get_read_db)):
+    if crud.get_course_by_code(db, code=course_code) is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    headers = {"Cache-Control": "no-cache"}
+    current = matrix.revision(db, course_code, history)
+    if if_none_match is not None:
+        if if_none_match.strip() == "*" or current.etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+            return Response(status_code=304, headers={**headers, "ETag": current.etag})
+    body = matrix.build(db, course_code, history, current)
+    response.headers.update({**headers, "ETag": body.pop("etag")})
+    return body
+
 @app.post("/enrollments/", response_model=schemas.Enrollment)
 def create_enrollment(enrollment: schemas.EnrollmentCreate, db: Session = Depends(get_db)):
-    db_enrollment = crud.get_enrollment_by_courseandstudent(db, coursecode=enrollment.course_code, studentid=enrollment.student_id)
-    if db_enrollment:
+    db_enrollment = crud.create_enrollment(db=db, enrollment=enrollment)
+    if db_enrollment is None:
         raise HTTPException(status_code=400, detail="already enrolled")
-    return crud.create_enrollment(db=db, enrollment=enrollment)
+    return db_enrollment
 
-@app.get("/enrollments")
-def read_enrollments(db: Session = Depends(get_db)):
-    return crud.get_all_enrollments(db)
+@app.get("/enrollments", response_model=schemas.Page[schemas.Enrollment])
+def read_enrollments(cursor: str | None = None, limit: PageSize = pagination.DEFAULT_PAGE_SIZE, course_code: str | None = None, student_id: str | None = None, db: Session = Depends(get_read_db)):
+    fields = fastjson.fields("read_enrollments", schemas.Enrollment)
+    enrollments = crud.get_all_enrollments(db, after=decode_cursor(cursor), limit=limit, course_code=course_code, student_id=student_id, fields=fields)
+    return enrollments if fields is None else fastjson.page(enrollments, fields)
 
 @app.get("/enrollments/code/{code}")
-def read_enrollments_by_code(code:str, db: Session = Depends(get_db)):
-    return crud.get_enrollment_by_course_code(db, code)
+async def read_enrollments_by_code(code:str, db: AsyncSession = Depends(get_async_read_db)):
+    return await async_crud.get_enrollment_by_course_code(db, code)
 
 @app.get("/enrollments/student/{student_id}")
-def read_enrollments_by_student(student_id:str, db: Session = Depends(get_db)):
-    return crud.get_enrollment_by_student_id(db, student_id)
+async def read_enrollments_by_student(student_id:str, db: AsyncSession = Depends(get_async_read_db)):
+    return await async_crud.get_enrollment_by_student_id(db, student_id)
 
 @app.delete("/enrollments/{enrollment_id}")
 def delete_enrollment(enrollment_id:str, db:Session = Depends(get_db)):
@@ -125,26 +238,43 @@ def delete_enrollment(enrollment_id:str, db:Session = Depends(get_db)):
     crud.delete_enrollment(db=db, enrollmentid=enrollment_id)
     return {"detail": "Enrollment deleted successfully"}
 
-@app.post("/course_classes/", response_model=schemas.CourseClassCreate)
-def create_course_class(course_class: schemas.CourseClassCreate, db: Session = Depends(get_db)):
+@app.post("/course_classes/", response_model=schemas.CourseClassCreate, responses={202: {"model": schemas.JobAccepted}})
+def create_course_class(course_class: schemas.CourseClassCreate, background: bool = False, db: Session = Depends(get_db)):
     db_course = crud.get_course_by_code(db, course_class.course_code)
     if db_course is None:
         raise HTTPException(status_code=404, detail="Course not found")
-    cc = crud.create_course_class(db=db, course_class=course_class)
-    for enrollment in db_course.enrollments:
-        # studentid:str = enrollment.student_id
-        # ccid:str = cc.id
-        a = schemas.AttendanceCreate(student_id=enrollment.student_id, course_class_id=cc.id)
-        crud.create_attendance(db, a)
-    return cc
-
-@app.get("/course_classes/")
-def read_course_classes(db: Session = Depends(get_db)):
-    return crud.get_all_course_classes(db)
+    if background:
+        # the class exists straight away; its attendance rows are filled in by the job
+        new_course_class = crud.create_course_class(db=db, course_class=course_class, seed=False)
+        return accepted(jobs.queue.submit("seed_course_class", course_class_id=new_course_class.id), course_class_id=new_course_class.id)
+    return crud.create_course_class(db=db, course_class=course_class)
+
+@app.post("/course_classes/schedule", response_model=schemas.ScheduleReport, responses={202: {"model": schemas.JobAccepted}})
+def schedule_course_classes(rule: schemas.ScheduleCreate, background: bool = False, db: Session = Depends(get_db)):
+    if rule.end_date < rule.start_date:
+        raise HTTPException(status_code=400, detail="end_date is before start_date")
+    missing = schedule.missing_courses(db, rule.course_codes)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Courses not found: {', '.join(missing)}")
+    if background:
+        return accepted(jobs.queue.submit("schedule", **rule.model_dump(mode="json")))
+    report = schedule.create(db, rule)
+    if rule.seed == "lazy" and report["classes_created"] and not storage.LAZY:
+        report["seed_job_id"] = jobs.queue.submit("seed_schedule", **rule.model_dump(mode="json"))
+    return report
+
+@app.get("/course_classes/", response_model=schemas.Page[schemas.CourseClassSummary])
+def read_course_classes(cursor: str | None = None, limit: PageSize = pagination.DEFAULT_PAGE_SIZE, course_code: str | None = None,
+                        date_from: datetime | None = None, date_to: datetime | None = None, db: Session = Depends(get_read_db)):
+    fields = fastjson.fields("read_course_classes", schemas.CourseClassSummary)
+    course_classes = crud.get_all_course_classes(db, after=decode_cursor(cursor), limit=limit, course_code=course_code, date_from=date_from, date_to=date_to, fields=fields)
+    return course_classes if fields is None else fastjson.page(course_classes, fields)
 
 @app.get("/course_classes/{code}")
-def read_course_classes_by_code(code:str, db: Session = Depends(get_db)):
-    return crud.get_course_class_by_course_code(db, code)
+def read_course_classes_by_code(code:str, expand: str | None = None, db: Session = Depends(get_read_db)):
+    expand = parse_expand(expand, loading.COURSE_CLASS)
+    course_classes = crud.get_course_class_by_course_code(db, code, options=loading.options(loading.COURSE_CLASS, expand))
+    return [loading.dump(course_class, schemas.CourseClass, loading.COURSE_CLASS, expand) for course_class in course_classes]
 
 @app.delete("/course_classes/{course_class_id}")
 def delete_course_class(course_class_id:str, db:Session = Depends(get_db)):
@@ -154,28 +284,131 @@ def delete_course_class(course_class_id:str, db:Session = Depends(get_db)):
     crud.delete_course_class(db=db, class_id=course_class_id)
     return {"detail": "Class deleted successfully"}
 
+@app.get("/course_classes/{course_class_id}/events")
+async def course_class_events(course_class_id: int):
+    # a short-lived session for the check: the stream can stay open for the whole class
+    async with get_async_sessionmaker()() as db:
+        if await async_crud.get_course_class_by_id(db, id=course_class_id) is None:
+            raise HTTPException(status_code=404, detail="Class not found")
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(realtime.class_events(course_class_id), media_type="text/event-stream", headers=headers)
+
 # @app.post("/attendance/", response_model=schemas.AttendanceCreate)
 # def create_attendance(attendance: schemas.AttendanceCreate, db: Session = Depends(get_db)):
 #     return crud.create_attendance(db=db, attendance=attendance)
 
-@app.get("/attendance/")
-def read_attendance(db: Session = Depends(get_db)):
-    return crud.get_all_attendance(db)
+@app.get("/attendance/", response_model=schemas.Page[schemas.Attendance])
+def read_attendance(cursor: str | None = None, limit: PageSize = pagination.DEFAULT_PAGE_SIZE, course_code: str | None = None, course_class_id: int | None = None,
+                    student_id: str | None = None, date_from: datetime | None = None, date_to: datetime | None = None, history: bool = False,
+                    db: Session = Depends(get_read_db)):
+    fields = fastjson.fields("read_attendance", schemas.Attendance)
+    attendance = crud.get_all_attendance(db, after=decode_cursor(cursor, crud.ATTENDANCE_CURSOR), limit=limit, course_code=course_code, course_class_id=course_class_id,
+                                         student_id=student_id, date_from=date_from, date_to=date_to, history=history, fields=fields)
+    return attendance if fields is None else fastjson.page(attendance, fields)
+
+@app.get("/attendance/export")
+def export_attendance(format: Literal["ndjson", "csv"] = "ndjson", course_code: str | None = None, student_id: str | None = None,
+                      date_from: datetime | None = None, date_to: datetime | None = None, history: bool = False):
+    rows = export.stream_attendance(format, course_code=course_code, student_id=student_id, date_from=date_from, date_to=date_to, history=history)
+    headers = {"Content-Disposition": f"attachment; filename=attendance.{format}"}
+    return StreamingResponse(rows, media_type=export.MEDIA_TYPES[format], headers=headers)
 
 @app.get("/attendance/student/{student_id}")
-def read_attendance_by_student(student_id:str, db: Session = Depends(get_db)):
-    return crud.get_attendance_by_student_id(db, student_id)
-
-@app.get("/attendance/course_class_id/{student_id}")
-def read_attendance_by_student(student_id:str, db: Session = Depends(get_db)):
-    return crud.get_attendance_by_student_id(db, student_id)
+async def read_attendance_by_student(student_id:str, history: bool = False, db: AsyncSession = Depends(get_async_read_db)):
+    fields = fastjson.fields("read_attendance_by_student", schemas.Attendance)
+    attendance = await async_crud.get_attendance_by_student_id(db, student_id, history, fields=fields)
+    return attendance if fields is None else fastjson.listing(attendance, fields)
+
+@app.get("/attendance/course_class_id/{course_class_id}")
+async def read_attendance_by_course_class(course_class_id:int, history: bool = False, db: AsyncSession = Depends(get_async_read_db)):
+    fields = fastjson.fields("read_attendance_by_course_class", schemas.Attendance)
+    attendance = await async_crud.get_attendance_by_course_class_id(db, course_class_id, history, fields=fields)
+    return attendance if fields is None else fastjson.listing(attendance, fields)
+
+@app.put("/attendance/batch", response_model=list[schemas.AttendanceBatchResult])
+async def mark_attendance_batch(batch: schemas.AttendanceBatchUpdate, db: AsyncSession = Depends(get_async_db)):
+    if batch.all_present_except is not None and (batch.present or batch.absent):
+        raise HTTPException(status_code=400, detail="all_present_except cannot be combined with present or absent")
+    if set(batch.present) & set(batch.absent):
+        raise HTTPException(status_code=400, detail="student marked both present and absent")
+    if await async_crud.get_course_class_by_id(db, id=batch.course_class_id) is None:
+        raise HTTPException(status_code=404, detail="Class not found")
+    return await async_crud.mark_attendance_batch(db, batch)
 
 @app.put("/attendance/{attendance_id}")
-def update_attendance(present:bool, attendance_id:int, db: Session = Depends(get_db)):
-    db_attendance = crud.get_attendance_by_id(db, attendance_id)
+async def update_attendance(present:bool, attendance_id:int, db: AsyncSession = Depends(get_async_db)):
+    db_attendance = await async_crud.get_attendance_by_id(db, attendance_id)
     if db_attendance is None:
         raise HTTPException(status_code=404, detail="Attendance not found")
-    return crud.update_attendance(db, attendance_id, present)
+    return await async_crud.update_attendance(db, attendance_id, present)
+
+@app.post("/import/{kind}", response_model=schemas.ImportReport, responses={202: {"model": schemas.JobAccepted}})
+def import_data(kind: Literal["users", "courses", "enrollments"], file: UploadFile, format: Literal["csv", "ndjson"] | None = None, background: bool = False,
+                db: Session = Depends(get_db)):
+    format = format or importer.format_for(file.filename)
+    if background:
+        return accepted(jobs.queue.submit("import", kind=kind, path=jobs.spool(file.file, suffix=f".{format}"), format=format))
+    return importer.import_file(db, kind, file.file, format)
+
+@app.get("/jobs/{job_id}", response_model=schemas.Job)
+def read_job(job_id: str):
+    job = jobs.queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+def read_job_result(job_id: str):
+    job = jobs.queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["finished_at"] is None:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return {"status": job["status"], "result": job["result"], "error": job["error"]}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return metrics.render()
+
+@app.get("/cache/stats")
+def read_cache_stats():
+    return cache.snapshot()
+
+@app.get("/stats/students/{student_id}", response_model=list[schemas.StudentCourseStats])
+async def read_student_stats(student_id:str, db: AsyncSession = Depends(get_async_read_db)):
+    return await async_crud.get_student_stats(db, student_id)
+
+@app.get("/stats/students/{student_id}/courses/{course_code}", response_model=schemas.StudentCourseStats)
+async def read_student_course_stats(student_id:str, course_code:str, db: AsyncSession = Depends(get_async_read_db)):
+    stats = await async_crud.get_student_course_stats(db, student_id, course_code)
+    if stats is None:
+        return schemas.StudentCourseStats(student_id=student_id, course_code=course_code)
+    return stats
+
+@app.get("/stats/course_classes/{course_class_id}", response_model=schemas.CourseClassStats)
+async def read_course_class_stats(course_class_id:int, db: AsyncSession = Depends(get_async_read_db)):
+    stats = await async_crud.get_course_class_stats(db, course_class_id)
+    if stats is None:
+        return schemas.CourseClassStats(course_class_id=course_class_id)
+    return stats
+
+@app.get("/analytics/below_threshold", response_model=list[schemas.StudentCourseStats])
+def read_students_below_threshold(threshold: Annotated[float, Query(ge=0, le=100)] = analytics.DEFAULT_THRESHOLD, course_code: str | None = None,
+                                  date_from: datetime | None = None, date_to: datetime | None = None, db: Session = Depends(get_read_db)):
+    rows = analytics.below_threshold(db, threshold, course_code, date_from, date_to)
+    return [{"student_id": student_id, "course_code": code, "present": present, "total": total} for student_id, code, present, total in rows]
+
+@app.get("/analytics/trend", response_model=list[schemas.AttendanceTrend])
+def read_attendance_trend(by: Literal["weekday", "hour"] = "weekday", course_code: str | None = None,
+                          date_from: datetime | None = None, date_to: datetime | None = None, db: Session = Depends(get_read_db)):
+    rows = analytics.trend(db, by, course_code, date_from, date_to)
+    return [{"bucket": bucket, "classes": classes, "present": present, "total": total} for bucket, classes, present, total in rows]
+
+@app.get("/analytics/instructors", response_model=list[schemas.InstructorStats])
+def read_instructor_stats(date_from: datetime | None = None, date_to: datetime | None = None, db: Session = Depends(get_read_db)):
+    rows = analytics.instructors(db, date_from, date_to)
+    return [{"instructor_id": instructor_id, "courses": courses, "classes": classes, "present": present, "total": total}
+            for instructor_id, courses, classes, present, total in rows]
 
 # @app.delete("/attendance/{attendance_id}")
 # def delete_attendance(attendance_id:str, db:Session = Depends(get_db)):
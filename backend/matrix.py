@@ -0,0 +1,82 @@
+# Student x class attendance matrix for a course in a compact form: the ordered student and class
+# ids plus two bitsets, one bit per cell in row-major order (cell = student index * classes + class
+# index, most significant bit first), base64 encoded. "recorded" marks cells that have an
+# attendance row at all, "present" the ones marked present.
+#
+# The ETag comes from the roster and each class's stats revision, which crud bumps on every mark,
+# so a conditional GET is answered from two index lookups without building the matrix. The
+# roster and classes are read once per request: revision() returns them with the ETag and build()
+# takes that revision, adding only the cells query. They stay separate queries, since a join of
+# enrollments and classes would return students x classes rows to give back the same two lists.
+
+import base64
+import hashlib
+from collections import namedtuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import crud, models
+
+Revision = namedtuple("Revision", ["roster", "classes", "etag"])
+
+
+def _roster(db: Session, course_code: str):
+    return db.execute(
+        select(models.Enrollment.id, models.Enrollment.student_id)
+        .where(models.Enrollment.course_code == course_code).order_by(models.Enrollment.student_id)
+    ).all()
+
+def _classes(db: Session, course_code: str):
+    return db.execute(
+        select(models.CourseClass.id, models.CourseClass.date_time, models.CourseClassStats.revision)
+        .outerjoin(models.CourseClassStats, models.CourseClassStats.course_class_id == models.CourseClass.id)
+        .where(models.CourseClass.course_code == course_code).order_by(models.CourseClass.date_time, models.CourseClass.id)
+    ).all()
+
+def _etag(course_code: str, history: bool, roster, classes):
+    digest = hashlib.sha1(repr((course_code, history, [tuple(r) for r in roster], [tuple(c) for c in classes])).encode())
+    return f'"{digest.hexdigest()}"'
+
+def revision(db: Session, course_code: str, history: bool = False):
+    roster, classes = _roster(db, course_code), _classes(db, course_code)
+    return Revision(roster, classes, _etag(course_code, history, roster, classes))
+
+def _bits(size: int):
+    return bytearray((size + 7) // 8)
+
+def _set(bits: bytearray, index: int):
+    bits[index >> 3] |= 0x80 >> (index & 7)
+
+def build(db: Session, course_code: str, history: bool = False, current: Revision | None = None):
+    roster, classes, etag = current or revision(db, course_code, history)
+    student_index = {student_id: i for i, (_, student_id) in enumerate(roster)}
+    class_index = {class_id: i for i, (class_id, _, _) in enumerate(classes)}
+
+    source = crud.attendance_source(history, course_code=course_code)
+    cells = db.execute(
+        select(source.student_id, source.course_class_id, source.present)
+        .join(models.CourseClass, models.CourseClass.id == source.course_class_id)
+        .where(models.CourseClass.course_code == course_code)
+    )
+    width = len(classes)
+    recorded, present = _bits(len(roster) * width), _bits(len(roster) * width)
+    for student_id, class_id, is_present in cells:
+        # attendance of students no longer enrolled is not part of the roster view
+        row = student_index.get(student_id)
+        if row is None:
+            continue
+        index = row * width + class_index[class_id]
+        _set(recorded, index)
+        if is_present:
+            _set(present, index)
+
+    return {
+        "course_code": course_code,
+        "student_ids": [student_id for _, student_id in roster],
+        "class_ids": [class_id for class_id, _, _ in classes],
+        "class_times": [date_time for _, date_time, _ in classes],
+        "recorded": base64.b64encode(recorded).decode(),
+        "present": base64.b64encode(present).decode(),
+        "etag": etag,
+    }
@@ -0,0 +1,152 @@
+# Per-route request latency, query count and SQL time, exposed in the Prometheus text format,
+# plus a slow-query log. Queries are attributed to the request that issued them through a
+# context variable, which FastAPI carries into the threadpool for sync routes.
+#
+# SLOW_QUERY_MS sets the slow-query threshold (default 200); the log goes to the "backend.slow_query" logger
+
+import contextvars
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import cache, database, realtime
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 200))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+slow_query_log = logging.getLogger("backend.slow_query")
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def render(self, name, labels):
+        lines = [f'{name}_bucket{{{labels},le="{bound}"}} {count}' for bound, count in zip(self.buckets, self.counts)]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class RequestStats:
+    __slots__ = ("request", "queries", "sql_seconds")
+
+    def __init__(self, request=None):
+        self.request = request
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+    @property
+    def route(self):
+        return route_of(self.request) if self.request is not None else None
+
+
+current = contextvars.ContextVar("request_stats", default=None)
+
+_lock = threading.Lock()
+_requests = {}
+_latency = {}
+_queries = {}
+_sql_time = {}
+
+
+def route_of(request):
+    # the path template keeps label cardinality bounded; unmatched paths are lumped together
+    route = request.scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on the statement's own execution context, so a statement that fails leaves nothing behind
+    context.query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.query_start
+    stats = current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.sql_seconds += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        route = stats.route if stats is not None else None
+        slow_query_log.warning("slow query %.1f ms route=%s statement=%s parameters=%r", elapsed * 1000, route, statement, parameters)
+
+def instrument():
+    # listening on the Engine class covers the sync engine, the async engine's sync_engine and any replicas
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+def record(method, route, status, seconds, stats):
+    key = (method, route)
+    with _lock:
+        _requests[key + (status,)] = _requests.get(key + (status,), 0) + 1
+        _latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+        _queries.setdefault(key, Histogram(QUERY_BUCKETS)).observe(stats.queries)
+        _sql_time.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(stats.sql_seconds)
+
+async def _recorded(body, done):
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        done()
+
+async def middleware(request, call_next):
+    stats = RequestStats(request)
+    token = current.set(stats)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        record(request.method, route_of(request), 500, time.perf_counter() - start, stats)
+        raise
+    finally:
+        current.reset(token)
+    # the body is sent after this returns, and a streamed one (/attendance/export) runs its queries
+    # while it is, so the request is recorded once the body is done or the client went away
+    done = lambda: record(request.method, route_of(request), response.status_code, time.perf_counter() - start, stats)
+    response.body_iterator = _recorded(response.body_iterator, done)
+    return response
+
+def _family(lines, name, kind, description):
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {kind}")
+
+def render():
+    lines = []
+    with _lock:
+        _family(lines, "http_requests_total", "counter", "Requests by method, route and status.")
+        for (method, route, status), count in sorted(_requests.items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+        for name, description, histograms in (
+            ("http_request_duration_seconds", "Request latency in seconds, until the body is sent.", _latency),
+            ("http_request_db_queries", "SQL statements issued per request.", _queries),
+            ("http_request_db_seconds", "Time per request spent in SQL statements, in seconds.", _sql_time),
+        ):
+            _family(lines, name, "histogram", description)
+            for (method, route), histogram in sorted(histograms.items()):
+                lines.extend(histogram.render(name, f'method="{method}",route="{route}"'))
+    _family(lines, "cache_requests_total", "counter", "Cache lookups by namespace and outcome.")
+    for namespace, counters in cache.snapshot()["namespaces"].items():
+        for outcome, count in counters.items():
+            lines.append(f'cache_requests_total{{namespace="{namespace}",outcome="{outcome}"}} {count}')
+    _family(lines, "realtime_subscribers", "gauge", "Open class event streams.")
+    lines.append(f"realtime_subscribers {realtime.broker.subscribers()}")
+    _family(lines, "db_replicas_healthy", "gauge", "Read replicas currently taking reads.")
+    lines.append(f"db_replicas_healthy {sum(database.replicas.healthy)}")
+    return "\n".join(lines) + "\n"
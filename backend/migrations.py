@@ -0,0 +1,81 @@
+# Brings an existing database up to the columns, indexes and unique constraints declared in models.py.
+# create_all only creates missing tables, so databases created before these were added need this.
+# Counter tables that start out empty next to existing classes are filled from the attendance, since
+# crud only applies deltas to them.
+#
+# run "python -m backend.migrations" (safe to run repeatedly)
+
+from sqlalchemy import UniqueConstraint, delete, exists, func, inspect, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn
+
+from . import aggregates, models
+from .database import engine
+
+
+def dedupe(conn, table, columns):
+    # keep the oldest row of every duplicate group so the unique index can be built
+    keep = select(func.min(table.c.id).label("id")).group_by(*columns).subquery()
+    return conn.execute(delete(table).where(table.c.id.not_in(select(keep.c.id)))).rowcount
+
+
+def create_unique_index(conn, table, name, columns):
+    # equivalent to the declared constraint and, unlike ADD CONSTRAINT, works on SQLite too
+    quote = conn.dialect.identifier_preparer.quote
+    conn.execute(text(f"CREATE UNIQUE INDEX {quote(name)} ON {quote(table.name)} ({', '.join(quote(c.name) for c in columns)})"))
+
+
+def add_column(conn, table, column):
+    # new NOT NULL columns carry a server_default so existing rows get a value
+    quote = conn.dialect.identifier_preparer.quote
+    conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}"))
+
+
+def backfill_counters(bind):
+    with Session(bind) as db:
+        if not db.scalar(select(exists().select_from(models.CourseClass))):
+            return False
+        if any(db.scalar(select(exists().select_from(table))) for table in (aggregates.student_stats, aggregates.class_stats)):
+            return False
+        aggregates.rebuild(db, repair=True)
+        return True
+
+
+def upgrade(bind=engine):
+    models.Base.metadata.create_all(bind=bind)
+    inspector = inspect(bind)
+    applied = []
+    with bind.begin() as conn:
+        for table in models.Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    add_column(conn, table, column)
+                    applied.append(f"{table.name}.{column.name}")
+
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            existing |= {uc["name"] for uc in inspector.get_unique_constraints(table.name)}
+
+            for constraint in table.constraints:
+                if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in existing:
+                    columns = list(constraint.columns)
+                    removed = dedupe(conn, table, columns)
+                    create_unique_index(conn, table, constraint.name, columns)
+                    applied.append(f"{constraint.name} (removed {removed} duplicate rows)")
+
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+                    applied.append(index.name)
+    if backfill_counters(bind):
+        applied.append("attendance counters (rebuilt)")
+    return applied
+
+
+if __name__ == "__main__":
+    applied = upgrade()
+    for name in applied:
+        print(f"created {name}")
+    print(f"{len(applied)} column(s), index(es) and counter table(s) created")
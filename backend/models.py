@@ -1,5 +1,7 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, CheckConstraint, DateTime
-from sqlalchemy.orm import relationship
+from functools import cache
+
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, CheckConstraint, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import aliased, relationship
 
 from .database import Base
 
@@ -9,7 +11,7 @@ class User(Base):
 
     id = Column(String(255), primary_key=True)
     password = Column(String(255), nullable=False)
-    role = Column(String(30), CheckConstraint("role in ('admin', 'instructor', 'student')"), nullable=False)
+    role = Column(String(30), CheckConstraint("role in ('admin', 'instructor', 'student')"), nullable=False, index=True)
     name = Column(String(255), nullable=False)
 
     instructor = relationship("Instructor", back_populates="user", cascade="all, delete", passive_deletes=True)
@@ -39,7 +41,7 @@ class Student(Base):
 class Course(Base):
     __tablename__ = "courses"
 
-    instructor_id = Column(String(255), ForeignKey("instructors.user_id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
+    instructor_id = Column(String(255), ForeignKey("instructors.user_id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False, index=True)
     code = Column(String(255), primary_key=True)
     title = Column(String(255), nullable=False)
 
@@ -49,9 +51,10 @@ class Course(Base):
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
+    __table_args__ = (UniqueConstraint("course_code", "student_id", name="uq_enrollments_course_code_student_id"),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    student_id = Column(String(255), ForeignKey("students.user_id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
+    student_id = Column(String(255), ForeignKey("students.user_id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False, index=True)
     course_code = Column(String(255), ForeignKey("courses.code", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
 
     student = relationship("Student", back_populates="enrollments")
@@ -59,6 +62,7 @@ class Enrollment(Base):
 
 class CourseClass(Base):
     __tablename__ = "course_classes"
+    __table_args__ = (Index("ix_course_classes_course_code_date_time", "course_code", "date_time"),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     date_time = Column(DateTime)
@@ -66,20 +70,63 @@ class CourseClass(Base):
 
     course = relationship("Course", back_populates="course_classes")
     attendance = relationship("Attendance", back_populates="course_class", cascade="all, delete", passive_deletes=True)
+    # stored rows plus the unmarked cells lazy storage derives from the roster; what ?expand=attendance
+    # loads in place of attendance when ATTENDANCE_STORAGE=lazy (see backend.storage)
+    attendance_cells = relationship(lambda: attendance_cells(), primaryjoin=lambda: CourseClass.id == attendance_cells().course_class_id, viewonly=True)
 
 
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    # sqlite_autoincrement stops sqlite reusing the ids of rows moved to attendance_archive
+    __table_args__ = (UniqueConstraint("course_class_id", "student_id", name="uq_attendance_course_class_id_student_id"), {"sqlite_autoincrement": True})
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    student_id = Column(String(255), ForeignKey("students.user_id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
+    student_id = Column(String(255), ForeignKey("students.user_id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False, index=True)
     course_class_id = Column(Integer, ForeignKey("course_classes.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
     present = Column(Boolean, nullable=False)
 
     student = relationship("Student", back_populates="attendance")
     course_class = relationship("CourseClass", back_populates="attendance")
 
+class AttendanceArchive(Base):
+    # attendance of closed terms, moved here by backend.archive; rows keep their original ids
+    __tablename__ = "attendance_archive"
+    __table_args__ = (
+        UniqueConstraint("course_class_id", "student_id", name="uq_attendance_archive_course_class_id_student_id"),
+        {"mariadb_row_format": "COMPRESSED", "mysql_row_format": "COMPRESSED"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    student_id = Column(String(255), ForeignKey("students.user_id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False, index=True)
+    course_class_id = Column(Integer, ForeignKey("course_classes.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
+    present = Column(Boolean, nullable=False)
+
+class StudentCourseStats(Base):
+    __tablename__ = "student_course_stats"
+
+    student_id = Column(String(255), ForeignKey("students.user_id", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
+    course_code = Column(String(255), ForeignKey("courses.code", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True, index=True)
+    present = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+
+class CourseClassStats(Base):
+    __tablename__ = "course_class_stats"
+
+    course_class_id = Column(Integer, ForeignKey("course_classes.id", ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
+    present = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+    # bumped whenever the class's attendance changes; only ever grows, so it can version cached views
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+@cache
+def attendance_cells():
+    # Attendance over the cells view of backend.storage; built when the mappers configure, since the
+    # view itself is made of these models
+    from .storage import cells
+    return aliased(Attendance, cells)
+
 # class Item(Base):
 #     __tablename__ = "items"
 
@@ -0,0 +1,49 @@
+import base64
+import json
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+def _key(value, types=(str, int)):
+    # what encode_cursor gets from a key column; json also decodes objects, floats, null and booleans
+    return isinstance(value, types) and not isinstance(value, bool)
+
+def decode_cursor(cursor: str | None, composite: tuple | None = None):
+    # composite: the types of a multi-column key, whose cursor is a list of one value per column
+    if cursor is None:
+        return None
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("invalid cursor")
+    if composite is None:
+        valid = _key(value)
+    else:
+        valid = isinstance(value, list) and len(value) == len(composite) and all(_key(v, t) for v, t in zip(value, composite))
+    if not valid:
+        raise ValueError("invalid cursor")
+    return value
+
+def page(rows, limit: int, key):
+    items = rows[:limit]
+    next_cursor = encode_cursor(key(items[-1])) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+def paginate(query, column, after, limit: int):
+    # keyset pagination: seek past the last key instead of OFFSET so every page costs the same
+    if after is not None:
+        query = query.filter(column > after)
+    rows = query.order_by(column).limit(limit + 1).all()
+    return page(rows, limit, lambda row: getattr(row, column.key))
+
+def seek(query, columns, after):
+    # the rows past a composite key, in key order
+    if after is not None:
+        query = query.filter(tuple_(*columns) > tuple_(*after))
+    return query.order_by(*columns)
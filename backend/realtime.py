@@ -0,0 +1,175 @@
+# Push channel for attendance marks: crud publishes the marks that changed once they are committed
+# and every open GET /course_classes/{id}/events stream (Server-Sent Events) of that class gets them,
+# so screens follow a roll call without polling. The broker is in-process by default; the redis one
+# relays publishes between workers. Each subscriber is an asyncio queue, so an idle connection
+# costs a coroutine and a few objects and a worker holds thousands of them.
+#
+# REALTIME_BACKEND=memory (default) | redis (with REDIS_URL), REALTIME_QUEUE_SIZE messages buffered
+# per subscriber, REALTIME_KEEPALIVE seconds between keepalive comments
+
+import asyncio
+import json
+import os
+import threading
+
+QUEUE_SIZE = int(os.environ.get("REALTIME_QUEUE_SIZE", 64))
+KEEPALIVE = float(os.environ.get("REALTIME_KEEPALIVE", 15))
+# queued in place of a backlog a subscriber fell too far behind on; the client should refetch
+RESYNC = object()
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+def _fanout(subscriptions, message):
+    for subscription in subscriptions:
+        subscription.put(message)
+
+
+class Subscription:
+    def __init__(self, broker, topic: str, maxsize: int):
+        self.broker = broker
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def put(self, message):
+        # runs on self.loop; a slow consumer is dropped to a resync rather than holding up the publisher
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESYNC
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: float | None = None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    # subscribers are grouped by event loop: a publish from another thread (a sync route in the
+    # threadpool) costs one call_soon_threadsafe per loop, not one per subscriber
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._topics = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str):
+        subscription = Subscription(self, topic, self.queue_size)
+        with self._lock:
+            self._topics.setdefault(topic, {}).setdefault(subscription.loop, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            loops = self._topics.get(subscription.topic, {})
+            subscriptions = loops.get(subscription.loop)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del loops[subscription.loop]
+            if not loops:
+                self._topics.pop(subscription.topic, None)
+
+    def subscribers(self, topic: str | None = None):
+        with self._lock:
+            topics = [self._topics.get(topic, {})] if topic is not None else self._topics.values()
+            return sum(len(subscriptions) for loops in topics for subscriptions in loops.values())
+
+    def publish(self, topic: str, message: str):
+        self._deliver(topic, message)
+
+    def _deliver(self, topic: str, message: str, only_loop=None):
+        with self._lock:
+            groups = [(loop, list(subscriptions)) for loop, subscriptions in self._topics.get(topic, {}).items()
+                      if only_loop is None or loop is only_loop]
+        current = _running_loop()
+        for loop, subscriptions in groups:
+            if loop is current:
+                _fanout(subscriptions, message)
+                continue
+            try:
+                loop.call_soon_threadsafe(_fanout, subscriptions, message)
+            except RuntimeError:
+                # the loop has closed; its subscriptions go with it
+                pass
+
+
+class RedisBroker(LocalBroker):
+    # publishes go through redis so every worker sees them; each event loop runs one pattern
+    # subscription and fans messages out to its local subscribers
+    def __init__(self, client, async_client, queue_size: int = QUEUE_SIZE, prefix: str = "attendance:events:"):
+        super().__init__(queue_size)
+        self.client = client
+        self.async_client = async_client
+        self.prefix = prefix
+        self._listeners = {}
+
+    def publish(self, topic: str, message: str):
+        self.client.publish(self.prefix + topic, message)
+
+    def subscribe(self, topic: str):
+        subscription = super().subscribe(topic)
+        listener = self._listeners.get(subscription.loop)
+        if listener is None or listener.done():
+            self._listeners[subscription.loop] = subscription.loop.create_task(self._listen(subscription.loop))
+        return subscription
+
+    async def _listen(self, loop):
+        pubsub = self.async_client.pubsub()
+        await pubsub.psubscribe(f"{self.prefix}*")
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "pmessage":
+                    channel, data = message["channel"], message["data"]
+                    channel = channel.decode() if isinstance(channel, bytes) else channel
+                    data = data.decode() if isinstance(data, bytes) else data
+                    self._deliver(channel[len(self.prefix):], data, only_loop=loop)
+        finally:
+            await pubsub.aclose()
+
+
+def configure():
+    if os.environ.get("REALTIME_BACKEND", "memory") == "redis":
+        import redis
+        import redis.asyncio
+
+        url = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+        return RedisBroker(redis.Redis.from_url(url), redis.asyncio.Redis.from_url(url))
+    return LocalBroker()
+
+
+broker = configure()
+
+
+def class_topic(course_class_id: int):
+    return f"course_class:{course_class_id}"
+
+def publish_marks(course_class_id: int, marks: list[dict]):
+    # marks: [{"attendance_id", "student_id", "present"}]; call after the transaction has committed
+    if marks:
+        broker.publish(class_topic(course_class_id), json.dumps({"course_class_id": course_class_id, "marks": marks}))
+
+async def class_events(course_class_id: int, keepalive: float = KEEPALIVE):
+    # Server-Sent Events; the first chunk confirms the subscription, so a client that reads the
+    # class after receiving it cannot miss a mark made in between
+    subscription = broker.subscribe(class_topic(course_class_id))
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                message = await subscription.get(keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if message is RESYNC:
+                yield "event: resync\ndata: {}\n\n"
+            else:
+                yield f"event: attendance\ndata: {message}\n\n"
+    finally:
+        subscription.close()
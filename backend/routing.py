@@ -0,0 +1,139 @@
+# Read-replica routing. A RoutingSession sends plain SELECTs to a replica and everything else to
+# the primary. Once it has written (a flush, an INSERT/UPDATE/DELETE, a SELECT ... FOR UPDATE) it
+# stays on the primary, so a request always reads its own writes. Each session keeps to one
+# replica, picked round robin among the healthy ones.
+#
+# Replicas are pinged every REPLICA_HEALTH_INTERVAL seconds and taken out after a failed ping or
+# a connection error until a ping succeeds again. A read that fails on a replica is retried on the
+# primary, and with no healthy replica left reads go to the primary.
+
+import contextlib
+import itertools
+import logging
+import threading
+import time
+
+from sqlalchemy import exc, text
+from sqlalchemy.orm import Session
+
+log = logging.getLogger("backend.routing")
+
+
+def _replication_lag(connection):
+    # seconds behind the primary on mariadb/mysql, None if replication isn't running
+    row = connection.exec_driver_sql("SHOW SLAVE STATUS").mappings().first()
+    if row is None:
+        return None
+    return row.get("Seconds_Behind_Master", row.get("Seconds_Behind_Source"))
+
+
+class ReplicaSet:
+    def __init__(self, engines, max_lag: float | None = None, health=None):
+        self.engines = list(engines)
+        self.max_lag = max_lag
+        # shared with the async engines of the same replicas, see sharing_health
+        self.healthy = health if health is not None else [True] * len(self.engines)
+        self._turn = itertools.count()
+
+    def __len__(self):
+        return len(self.engines)
+
+    def sharing_health(self, engines):
+        return ReplicaSet(engines, self.max_lag, health=self.healthy)
+
+    def pick(self):
+        up = [engine for engine, healthy in zip(self.engines, self.healthy) if healthy]
+        return up[next(self._turn) % len(up)] if up else None
+
+    def mark_down(self, engine, error):
+        index = self.engines.index(engine)
+        if self.healthy[index]:
+            log.warning("replica %s marked down: %s", engine.url.render_as_string(), error)
+        self.healthy[index] = False
+
+    def _ping(self, engine):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            if self.max_lag is not None and engine.dialect.name in ("mysql", "mariadb"):
+                lag = _replication_lag(connection)
+                if lag is None or lag > self.max_lag:
+                    raise RuntimeError(f"replication lag {lag}")
+
+    def check(self):
+        for index, engine in enumerate(self.engines):
+            try:
+                self._ping(engine)
+            except Exception as e:
+                self.mark_down(engine, e)
+            else:
+                if not self.healthy[index]:
+                    log.warning("replica %s back up", engine.url.render_as_string())
+                self.healthy[index] = True
+
+    def monitor(self, interval: float):
+        def loop():
+            while True:
+                self.check()
+                time.sleep(interval)
+        threading.Thread(target=loop, name="replica-health", daemon=True).start()
+
+
+def _is_read(clause):
+    return clause is not None and getattr(clause, "is_select", False) and getattr(clause, "_for_update_arg", None) is None
+
+
+class RoutingSession(Session):
+    def __init__(self, *args, primary, replicas: ReplicaSet, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.primary = primary
+        self.replicas = replicas
+        self._replica = None
+        self._pinned = False
+        self._primary_reads = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._pinned or self._flushing or not _is_read(clause):
+            self._pinned = True
+            return self.primary
+        if self._primary_reads:
+            return self.primary
+        if self._replica is None:
+            self._replica = self.replicas.pick() or self.primary
+        return self._replica
+
+    def _read(self, method, statement, *args, **kwargs):
+        try:
+            return method(statement, *args, **kwargs)
+        except (exc.OperationalError, exc.InterfaceError) as e:
+            # only reads reach a replica, and never after a write, so the transaction holds
+            # nothing that a rollback would lose
+            if self._replica is None or self._replica is self.primary or self._pinned or self._primary_reads:
+                raise
+            self.replicas.mark_down(self._replica, e)
+            self.rollback()
+            self._replica = self.primary
+            return method(statement, *args, **kwargs)
+
+    def execute(self, statement, *args, **kwargs):
+        return self._read(super().execute, statement, *args, **kwargs)
+
+    def scalar(self, statement, *args, **kwargs):
+        return self._read(super().scalar, statement, *args, **kwargs)
+
+    def scalars(self, statement, *args, **kwargs):
+        return self._read(super().scalars, statement, *args, **kwargs)
+
+
+@contextlib.contextmanager
+def primary_reads(session):
+    # reads inside the block go to the primary without pinning the session, e.g. to fill a shared
+    # cache, which must not keep a lagging replica's copy after the writer invalidated it
+    session = getattr(session, "sync_session", session)
+    if not isinstance(session, RoutingSession) or session._primary_reads:
+        yield
+        return
+    session._primary_reads = True
+    try:
+        yield
+    finally:
+        session._primary_reads = False
@@ -0,0 +1,142 @@
+# Recurring class schedules: a rule (weekdays, time of day, date range, dates to skip) is expanded
+# into course_classes rows for one or many courses with a few statements per batch of courses,
+# instead of one POST /course_classes/ per class. Each batch is its own transaction, and classes
+# that already exist at a scheduled time are skipped, so rerunning a schedule only fills the gaps.
+#
+# seed="bulk" inserts the absent attendance rows of a batch's classes in the same transaction, one
+# INSERT ... SELECT per batch; seed="lazy" only creates the classes and seed_pending fills in the
+# attendance afterwards (the API runs it as a background job).
+#
+# run "python -m backend.schedule C101 C102 --weekdays mon wed fri --time 09:00 --start 2026-09-07 --end 2026-12-18 --skip 2026-11-26"
+
+import argparse
+import time as clock
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import exists, insert, literal, select
+from sqlalchemy.orm import Session
+
+from . import aggregates, models, schemas, storage
+
+BATCH_COURSES = 50
+BATCH_CLASSES = 500
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def occurrences(weekdays, at: time, start: date, end: date, skip=()):
+    days = {WEEKDAYS.index(day) for day in weekdays}
+    skip = set(skip)
+    result = []
+    day = start
+    while day <= end:
+        if day.weekday() in days and day not in skip:
+            result.append(datetime.combine(day, at))
+        day += timedelta(days=1)
+    return result
+
+def missing_courses(db: Session, course_codes):
+    found = set(db.scalars(select(models.Course.code).where(models.Course.code.in_(course_codes))))
+    return [code for code in dict.fromkeys(course_codes) if code not in found]
+
+def seed(db: Session, class_ids):
+    # one absent row per enrolled student for classes that have no attendance yet
+    if storage.LAZY:
+        aggregates.unmarked_added(db, storage.unmarked.c.course_class_id.in_(class_ids))
+        return 0
+    rows = (
+        select(models.Enrollment.student_id, models.CourseClass.id, literal(False))
+        .join(models.Enrollment, models.Enrollment.course_code == models.CourseClass.course_code)
+        .where(models.CourseClass.id.in_(class_ids))
+    )
+    inserted = db.execute(insert(models.Attendance).from_select(["student_id", "course_class_id", "present"], rows)).rowcount
+    aggregates.classes_seeded(db, class_ids)
+    return inserted
+
+def create(db: Session, rule: schemas.ScheduleCreate, batch_courses: int = BATCH_COURSES, progress=None):
+    started = clock.perf_counter()
+    times = occurrences(rule.weekdays, rule.time, rule.start_date, rule.end_date, rule.skip_dates)
+    course_codes = list(dict.fromkeys(rule.course_codes))
+    created, skipped, seeded = 0, 0, 0
+    for i in range(0, len(course_codes) if times else 0, batch_courses):
+        batch = course_codes[i:i + batch_courses]
+        in_range = (
+            models.CourseClass.course_code.in_(batch),
+            models.CourseClass.date_time >= times[0], models.CourseClass.date_time <= times[-1],
+        )
+        existing = set(db.execute(select(models.CourseClass.course_code, models.CourseClass.date_time).where(*in_range)).all())
+        rows = [{"course_code": code, "date_time": at} for code in batch for at in times if (code, at) not in existing]
+        if rows:
+            db.execute(insert(models.CourseClass), rows)
+            # with lazy storage seeding only counts the derived cells, so there is nothing to defer
+            if rule.seed == "bulk" or storage.LAZY:
+                class_ids = [
+                    class_id for class_id, code, at in db.execute(
+                        select(models.CourseClass.id, models.CourseClass.course_code, models.CourseClass.date_time).where(*in_range))
+                    if (code, at) not in existing
+                ]
+                seeded += seed(db, class_ids)
+        db.commit()
+        created += len(rows)
+        skipped += len(batch) * len(times) - len(rows)
+        if progress is not None:
+            progress(i + len(batch), len(course_codes))
+    return {
+        "courses": len(course_codes),
+        "classes_created": created,
+        "classes_skipped": skipped,
+        "attendance_seeded": seeded,
+        "seconds": round(clock.perf_counter() - started, 3),
+    }
+
+def seed_pending(db: Session, rule: schemas.ScheduleCreate, batch_classes: int = BATCH_CLASSES, progress=None):
+    # the lazy half of create: seeds the classes in the rule's courses and date range that have
+    # no attendance rows in either table, a batch of classes per transaction
+    if storage.LAZY:
+        return 0
+    seeded, after = 0, 0
+    first, last = datetime.combine(rule.start_date, time.min), datetime.combine(rule.end_date, time.max)
+    unseeded = [~exists().where(table.c.course_class_id == models.CourseClass.id) for table in aggregates.attendance_tables]
+    while True:
+        class_ids = list(db.scalars(
+            select(models.CourseClass.id)
+            .where(models.CourseClass.course_code.in_(rule.course_codes), models.CourseClass.date_time.between(first, last),
+                   models.CourseClass.id > after, *unseeded)
+            .order_by(models.CourseClass.id).limit(batch_classes)
+        ))
+        if not class_ids:
+            return seeded
+        after = class_ids[-1]
+        seeded += seed(db, class_ids)
+        db.commit()
+        if progress is not None:
+            progress(seeded, None)
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("course_codes", nargs="+")
+    parser.add_argument("--weekdays", nargs="+", choices=WEEKDAYS, required=True)
+    parser.add_argument("--time", type=time.fromisoformat, required=True)
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    parser.add_argument("--skip", type=date.fromisoformat, nargs="*", default=[], help="holidays and other dates without classes")
+    parser.add_argument("--seed", choices=["bulk", "lazy"], default="bulk")
+    parser.add_argument("--batch-courses", type=int, default=BATCH_COURSES)
+    args = parser.parse_args()
+
+    rule = schemas.ScheduleCreate(course_codes=args.course_codes, weekdays=args.weekdays, time=args.time, start_date=args.start,
+                                  end_date=args.end, skip_dates=args.skip, seed=args.seed)
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        missing = missing_courses(db, rule.course_codes)
+        if missing:
+            parser.error(f"courses not found: {', '.join(missing)}")
+        report = create(db, rule, args.batch_courses, progress=lambda done, total: print(f"{done}/{total} courses"))
+        if rule.seed == "lazy":
+            report["attendance_seeded"] = seed_pending(db, rule)
+    finally:
+        db.close()
+    print(report)
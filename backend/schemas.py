@@ -1,5 +1,14 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field, computed_field
+from datetime import date, datetime, time
+from typing import Generic, Literal, TypeVar
+
+from . import storage
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: str | None = None
 
 class AttendanceBase(BaseModel):
     student_id: str
@@ -15,6 +24,18 @@ class Attendance(AttendanceBase):
     class Config:
         orm_mode = True
 
+class AttendanceBatchUpdate(BaseModel):
+    course_class_id: int
+    present: list[str] = []
+    absent: list[str] = []
+    all_present_except: list[str] | None = None
+
+class AttendanceBatchResult(BaseModel):
+    student_id: str
+    attendance_id: int | None = None
+    present: bool | None = None
+    status: str
+
 class CourseClassBase(BaseModel):
     date_time: datetime
     course_code: str
@@ -22,13 +43,38 @@ class CourseClassBase(BaseModel):
 class CourseClassCreate(CourseClassBase):
     pass
 
+class CourseClassSummary(CourseClassBase):
+    id:int
+
+    class Config:
+        orm_mode = True
+
 class CourseClass(CourseClassBase):
     id:int
-    attendance: list[Attendance] = []
+    # lazy storage loads the derived cells as attendance_cells
+    attendance: list[Attendance] = Field([], validation_alias=storage.class_attendance().key)
 
     class Config:
         orm_mode = True
 
+class ScheduleCreate(BaseModel):
+    course_codes: list[str]
+    weekdays: list[Literal["mon", "tue", "wed", "thu", "fri", "sat", "sun"]]
+    time: time
+    start_date: date
+    end_date: date
+    skip_dates: list[date] = []
+    # bulk: attendance rows are inserted with the classes; lazy: by a background job afterwards
+    seed: Literal["bulk", "lazy"] = "bulk"
+
+class ScheduleReport(BaseModel):
+    courses: int
+    classes_created: int
+    classes_skipped: int
+    attendance_seeded: int
+    seconds: float
+    seed_job_id: str | None = None
+
 class EnrollmentBase(BaseModel):
     student_id: str
     course_code:str
@@ -95,4 +141,78 @@ class UserCreate(UserBase):
 class User(UserBase):
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class Login(BaseModel):
+    id: str
+    password: str
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+
+class Principal(BaseModel):
+    user_id: str
+    role: str
+
+class AttendanceStats(BaseModel):
+    present: int = 0
+    total: int = 0
+
+    @computed_field
+    @property
+    def percentage(self) -> float | None:
+        return round(100 * self.present / self.total, 2) if self.total else None
+
+    class Config:
+        orm_mode = True
+
+class StudentCourseStats(AttendanceStats):
+    student_id: str
+    course_code: str
+
+class CourseClassStats(AttendanceStats):
+    course_class_id: int
+
+class AttendanceTrend(AttendanceStats):
+    # weekday name or hour of the day
+    bucket: str | int
+    classes: int
+
+class InstructorStats(AttendanceStats):
+    instructor_id: str
+    courses: int
+    classes: int
+
+class AttendanceMatrix(BaseModel):
+    course_code: str
+    student_ids: list[str]
+    class_ids: list[int]
+    class_times: list[datetime | None]
+    # base64 bitsets, one bit per (student, class) cell, row-major, most significant bit first
+    recorded: str
+    present: str
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: str
+    done: int = 0
+    total: int | None = None
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+class JobAccepted(BaseModel):
+    job_id: str
+    status_url: str
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReport(BaseModel):
+    inserted: int
+    errors: list[ImportRowError] = []
@@ -0,0 +1,134 @@
+# Attendance storage modes. eager (the default) stores a row for every enrolled student in every
+# class, created absent along with the class. lazy stores only the rows somebody marked (and the
+# archived ones): a cell without a row is derived at read time from enrollments x classes as
+# absent, so the attendance table holds the marks rather than the whole roster grid, and creating
+# a class or a term of classes writes no attendance at all.
+#
+# An unmarked cell has no id of its own; reads give it the negative virtual id
+# -(course_class_id * 2**32 + enrollment_id), which PUT /attendance/{id} accepts and turns into a
+# stored row. The counters include unmarked cells, so the stats read the same in both modes.
+#
+# ATTENDANCE_STORAGE=eager (default) | lazy
+# run "python -m backend.storage compact" after switching an existing database to lazy (drops the
+# stored absences that can be derived), "python -m backend.storage materialize" before switching back
+
+import os
+import sys
+
+from sqlalchemy import and_, delete, exists, false, insert, select, union_all
+from sqlalchemy.orm import Session, aliased
+
+from . import models
+
+LAZY = os.environ.get("ATTENDANCE_STORAGE", "eager") == "lazy"
+VIRTUAL_ID_BASE = 2 ** 32
+BATCH_CLASSES = 100
+
+live = models.Attendance.__table__
+archived = models.AttendanceArchive.__table__
+
+
+def _stored(table):
+    return select(table.c.id, table.c.student_id, table.c.course_class_id, table.c.present)
+
+def _unmarked(*conditions):
+    # enrolled students x classes of their course, minus the cells that have a row in either table
+    return (
+        select(
+            (-(models.CourseClass.id * VIRTUAL_ID_BASE + models.Enrollment.id)).label("id"),
+            models.Enrollment.student_id, models.CourseClass.id.label("course_class_id"), false().label("present"),
+        )
+        .select_from(models.CourseClass)
+        .join(models.Enrollment, models.Enrollment.course_code == models.CourseClass.course_code)
+        .where(*(~exists().where(table.c.course_class_id == models.CourseClass.id, table.c.student_id == models.Enrollment.student_id)
+                 for table in (live, archived)), *conditions)
+    )
+
+unmarked = _unmarked().subquery("unmarked_attendance")
+# live attendance with the unmarked cells filled in, the target of CourseClass.attendance_cells
+cells = union_all(_stored(live), _unmarked()).subquery("attendance_cells")
+
+# live attendance plus the archived rows of closed terms, for reads that ask for history
+AttendanceHistory = aliased(models.Attendance, union_all(_stored(live), _stored(archived)).subquery("attendance_history"))
+# the same two views with the unmarked cells filled in, for lazy storage
+AttendanceCells = models.attendance_cells()
+AttendanceCellsHistory = aliased(models.Attendance, union_all(_stored(live), _stored(archived), _unmarked()).subquery("attendance_cells_history"))
+
+
+def source(history: bool = False, *conditions):
+    # conditions on models.CourseClass are applied inside every branch of the lazy view
+    if not LAZY:
+        return AttendanceHistory if history else models.Attendance
+    if not conditions:
+        return AttendanceCellsHistory if history else AttendanceCells
+    stored = [
+        _stored(table).join(models.CourseClass, models.CourseClass.id == table.c.course_class_id).where(*conditions)
+        for table in ((live, archived) if history else (live,))
+    ]
+    return aliased(models.Attendance, union_all(*stored, _unmarked(*conditions)).subquery("attendance_cells"))
+
+def class_attendance():
+    return models.CourseClass.attendance_cells if LAZY else models.CourseClass.attendance
+
+def resolve(db: Session, attendance_id: int):
+    # the (course_class_id, student_id) cell behind a virtual id, or None
+    course_class_id, enrollment_id = divmod(-attendance_id, VIRTUAL_ID_BASE)
+    student_id = db.scalar(
+        select(models.Enrollment.student_id)
+        .join(models.CourseClass, models.CourseClass.course_code == models.Enrollment.course_code)
+        .where(models.Enrollment.id == enrollment_id, models.CourseClass.id == course_class_id)
+    )
+    return (course_class_id, student_id) if student_id is not None else None
+
+def materialize(db: Session, *conditions):
+    # stores the unmarked cells matching conditions as absent rows; they were already counted as
+    # absent, so the counters don't move
+    rows = _unmarked(*conditions).with_only_columns(models.Enrollment.student_id, models.CourseClass.id, false())
+    return db.execute(insert(models.Attendance).from_select(["student_id", "course_class_id", "present"], rows)).rowcount
+
+def _derivable():
+    # stored absences that lazy storage would derive anyway: the student is still enrolled
+    return and_(~live.c.present, exists().where(
+        models.CourseClass.id == live.c.course_class_id, models.Enrollment.course_code == models.CourseClass.course_code,
+        models.Enrollment.student_id == live.c.student_id))
+
+def compact(db: Session, batch_classes: int = BATCH_CLASSES, progress=None):
+    removed, after = 0, 0
+    while True:
+        class_ids = list(db.scalars(select(models.CourseClass.id).where(models.CourseClass.id > after).order_by(models.CourseClass.id).limit(batch_classes)))
+        if not class_ids:
+            return removed
+        after = class_ids[-1]
+        removed += db.execute(delete(live).where(live.c.course_class_id.in_(class_ids), _derivable())).rowcount
+        db.commit()
+        if progress is not None:
+            progress(removed)
+
+def materialize_all(db: Session, batch_classes: int = BATCH_CLASSES, progress=None):
+    stored, after = 0, 0
+    while True:
+        class_ids = list(db.scalars(select(models.CourseClass.id).where(models.CourseClass.id > after).order_by(models.CourseClass.id).limit(batch_classes)))
+        if not class_ids:
+            return stored
+        after = class_ids[-1]
+        stored += materialize(db, models.CourseClass.id.in_(class_ids))
+        db.commit()
+        if progress is not None:
+            progress(stored)
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal, engine
+
+    if sys.argv[1:] not in (["compact"], ["materialize"]):
+        sys.exit("usage: python -m backend.storage compact|materialize")
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if sys.argv[1] == "compact":
+            count = compact(db, progress=lambda n: print(f"{n} rows removed"))
+        else:
+            count = materialize_all(db, progress=lambda n: print(f"{n} rows stored"))
+    finally:
+        db.close()
+    print(f"{count} attendance rows {'removed' if sys.argv[1] == 'compact' else 'stored'}")
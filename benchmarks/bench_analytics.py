@@ -0,0 +1,87 @@
+# Times the backend.analytics reports against the loop they replace: streaming every attendance
+# row with its class time and course into Python and counting there. Each report runs cold (cache
+# cleared) and warm, over the whole history and over a term, and both ways must agree.
+#
+# run "python -m benchmarks.dataset --students 50000 --courses 2000 --classes-per-course 50 --students-per-course 50 --reset"
+# (~5M attendance rows) and then "python -m benchmarks.bench_analytics" against the same DATABASE_URL
+
+import argparse
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from backend import analytics, cache, crud, models
+from backend.database import SessionLocal
+from backend.schedule import WEEKDAYS
+
+
+def naive(db, date_from=None, date_to=None, threshold=analytics.DEFAULT_THRESHOLD):
+    source = crud.attendance_source(True, date_from=date_from, date_to=date_to)
+    rows = db.execute(
+        select(source.student_id, models.CourseClass.course_code, models.CourseClass.date_time, source.present)
+        .join(models.CourseClass, models.CourseClass.id == source.course_class_id)
+        .where(*crud.class_conditions(date_from=date_from, date_to=date_to))
+        .execution_options(yield_per=10000)
+    )
+    enrolled = {tuple(row) for row in db.execute(select(models.Enrollment.student_id, models.Enrollment.course_code))}
+    students, weekdays, count = {}, {}, 0
+    for student_id, course_code, date_time, present in rows:
+        count += 1
+        weekday = weekdays.setdefault(WEEKDAYS[date_time.weekday()], [0, 0])
+        weekday[0] += present
+        weekday[1] += 1
+        if (student_id, course_code) in enrolled:
+            cell = students.setdefault((student_id, course_code), [0, 0])
+            cell[0] += present
+            cell[1] += 1
+    below = {(s, c, p, t) for (s, c), (p, t) in students.items() if p * 100 < threshold * t}
+    return count, below, {day: tuple(counts) for day, counts in weekdays.items()}
+
+
+def timed(load):
+    started = time.perf_counter()
+    result = load()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--term-from", type=datetime.fromisoformat, default=None, help="default: the middle half of the data")
+    parser.add_argument("--term-to", type=datetime.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        first, last = db.execute(select(func.min(models.CourseClass.date_time), func.max(models.CourseClass.date_time))).one()
+        if first is None:
+            raise SystemExit("no classes; generate a dataset with benchmarks.dataset first")
+        term_from = args.term_from or first + (last - first) / 4
+        term_to = args.term_to or first + (last - first) * 3 / 4
+
+        print(f"{'report':<34} {'rows':>9} {'python loop':>12} {'cold':>10} {'warm':>10}")
+        for label, date_from, date_to in (("whole history", None, None), ("term", term_from, term_to)):
+            loop_seconds, (count, below, weekdays) = timed(lambda: naive(db, date_from, date_to))
+            reports = (
+                ("below threshold", lambda: analytics.below_threshold(db, date_from=date_from, date_to=date_to)),
+                ("trend by weekday", lambda: analytics.trend(db, "weekday", date_from=date_from, date_to=date_to)),
+                ("instructors", lambda: analytics.instructors(db, date_from, date_to)),
+            )
+            for name, load in reports:
+                if cache.backend is not None:
+                    cache.backend.clear()
+                cold, result = timed(load)
+                warm, _ = timed(load)
+                if name == "below threshold" and set(result) != below:
+                    raise SystemExit(f"{label}: below threshold differs from the python loop")
+                if name == "trend by weekday" and {day: (p, t) for day, _, p, t in result} != weekdays:
+                    raise SystemExit(f"{label}: weekday trend differs from the python loop")
+                print(f"{f'{name}, {label}':<34} {count:>9} {loop_seconds * 1000:>10.1f}ms {cold * 1000:>8.1f}ms {warm * 1000:>8.2f}ms")
+        if cache.backend is None:
+            print("CACHE_BACKEND=none: warm runs recompute")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Times POST /course_classes/ style creation at several class sizes:
+# the old per-enrollment create_attendance loop against the bulk
+# INSERT ... SELECT in crud.create_course_class.
+#
+# run "python -m benchmarks.bench_course_class_creation" against the configured database
+
+import time
+from datetime import datetime
+
+from backend import crud, models, schemas
+from backend.database import SessionLocal, engine
+from benchmarks.dataset import remove_prefixed, seed_prefixed
+
+SIZES = [10, 100, 1000]
+PREFIX = "bench-ccc"
+
+
+def setup(db, size):
+    course = f"{PREFIX}-{size}"
+    seed_prefixed(db, PREFIX, size, [course])
+    return course
+
+
+def per_row(db, course_code):
+    course = crud.get_course_by_code(db, course_code)
+    cc = models.CourseClass(date_time=datetime.now(), course_code=course_code)
+    db.add(cc)
+    db.flush()
+    db.commit()
+    for enrollment in course.enrollments:
+        crud.create_attendance(db, schemas.AttendanceCreate(student_id=enrollment.student_id, course_class_id=cc.id))
+
+
+def bulk(db, course_code):
+    crud.create_course_class(db, schemas.CourseClassCreate(date_time=datetime.now(), course_code=course_code))
+
+
+def main():
+    models.Base.metadata.create_all(bind=engine)
+    print(f"{'enrollments':>12} {'per-row (s)':>12} {'bulk (s)':>10} {'speedup':>8}")
+    for size in SIZES:
+        db = SessionLocal()
+        try:
+            remove_prefixed(db, PREFIX)
+            course_code = setup(db, size)
+            timings = []
+            for fn in (per_row, bulk):
+                start = time.perf_counter()
+                fn(db, course_code)
+                timings.append(time.perf_counter() - start)
+                db.expire_all()
+            print(f"{size:>12} {timings[0]:>12.4f} {timings[1]:>10.4f} {timings[0] / timings[1]:>7.1f}x")
+        finally:
+            remove_prefixed(db, PREFIX)
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
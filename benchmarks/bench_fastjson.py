@@ -0,0 +1,83 @@
+# Compares the default response path (ORM entities through response_model validation and
+# jsonable_encoder) with backend.fastjson (column rows encoded by orjson) on the big list routes:
+# CPU time and latency per request for each, and checks both return the same JSON.
+#
+# run "python -m benchmarks.bench_fastjson" against a scratch database (e.g. DATABASE_URL=sqlite:///./bench.db)
+
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from backend import crud, fastjson, models, schemas
+from backend.database import SessionLocal, engine
+from backend.main import app
+from benchmarks.dataset import remove_prefixed, seed_prefixed
+
+PREFIX = "bench-fj"
+COURSE = f"{PREFIX}-course"
+
+
+def setup(db, students, classes):
+    _, student_ids = seed_prefixed(db, PREFIX, students, [COURSE])
+    start = datetime(2030, 1, 7, 9)
+    class_ids = [crud.create_course_class(db, schemas.CourseClassCreate(course_code=COURSE, date_time=start + timedelta(days=k))).id
+                 for k in range(classes)]
+    return student_ids[0], class_ids[0]
+
+
+def measure(client, path, params, requests):
+    client.get(path, params=params)
+    latencies = []
+    cpu = time.process_time()
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(path, params=params)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return (time.process_time() - cpu) / requests, statistics.median(latencies), response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--classes", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=30)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    remove_prefixed(db, PREFIX)
+    student_id, class_id = setup(db, args.students, args.classes)
+    client = TestClient(app)
+    cases = [
+        ("/attendance/", {"course_code": COURSE, "limit": 1000}),
+        ("/enrollments", {"course_code": COURSE, "limit": 1000}),
+        ("/course_classes/", {"course_code": COURSE, "limit": 1000}),
+        ("/users/", {"role": "student", "limit": 1000}),
+        (f"/attendance/course_class_id/{class_id}", {}),
+        (f"/attendance/student/{student_id}", {}),
+    ]
+    print(f"encoder: {'orjson' if fastjson.orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'route':<34} {'rows':>6} {'default cpu':>12} {'fast cpu':>10} {'default p50':>12} {'fast p50':>10} {'speedup':>8}")
+    try:
+        for path, params in cases:
+            results = {}
+            for setting in ("none", "all"):
+                fastjson.SETTING = setting
+                results[setting] = measure(client, path, params, args.requests)
+            (slow_cpu, slow_p50, slow), (fast_cpu, fast_p50, fast) = results["none"], results["all"]
+            if slow.json() != fast.json():
+                raise SystemExit(f"{path}: the two paths returned different JSON")
+            body = fast.json()
+            rows = len(body["items"] if isinstance(body, dict) else body)
+            print(f"{path[:34]:<34} {rows:>6} {slow_cpu * 1000:>10.2f}ms {fast_cpu * 1000:>8.2f}ms "
+                  f"{slow_p50 * 1000:>10.2f}ms {fast_p50 * 1000:>8.2f}ms {slow_cpu / fast_cpu:>7.1f}x")
+    finally:
+        remove_prefixed(db, PREFIX)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Loads a synthetic attendance table (1M rows by default) and prints the query plan
+# and mean latency of every hot lookup in crud.py, to confirm they use the indexes
+# declared in models.py.
+#
+# run "python -m benchmarks.bench_indexes [attendance_rows]" against the configured database
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, text
+
+from backend import models
+from backend.database import SessionLocal, engine
+from benchmarks.dataset import remove_prefixed, seed_prefixed
+
+PREFIX = "bench-ix"
+STUDENTS_PER_COURSE = 100
+COURSES_PER_STUDENT = 5
+CLASSES_PER_COURSE = 200
+REPEAT = 50
+
+
+def setup(db, rows):
+    courses = max(1, rows // (STUDENTS_PER_COURSE * CLASSES_PER_COURSE))
+    students = max(STUDENTS_PER_COURSE, courses * STUDENTS_PER_COURSE // COURSES_PER_STUDENT)
+    course_codes = [f"{PREFIX}-course-{i}" for i in range(courses)]
+    instructor, student_ids = seed_prefixed(db, PREFIX, students, course_codes, STUDENTS_PER_COURSE, spread=STUDENTS_PER_COURSE // COURSES_PER_STUDENT)
+    start = datetime(2024, 1, 1, 9)
+    db.execute(insert(models.CourseClass), [
+        {"course_code": c, "date_time": start + timedelta(days=k)} for c in course_codes for k in range(CLASSES_PER_COURSE)
+    ])
+    seed = (
+        select(models.Enrollment.student_id, models.CourseClass.id, models.CourseClass.id % 3 != 0)
+        .join(models.CourseClass, models.CourseClass.course_code == models.Enrollment.course_code)
+        .where(models.Enrollment.course_code.like(f"{PREFIX}-%"))
+    )
+    db.execute(insert(models.Attendance).from_select(["student_id", "course_class_id", "present"], seed))
+    db.commit()
+    return student_ids[0], course_codes[0], instructor
+
+
+def explain(db, statement):
+    compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    prefix = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+    return [" | ".join(str(col) for col in row) for row in db.execute(text(f"{prefix} {compiled}"))]
+
+
+def timed(db, statement):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        db.execute(statement).all()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        remove_prefixed(db, PREFIX)
+        student_id, course_code, instructor_id = setup(db, rows)
+        class_id = db.scalar(select(models.CourseClass.id).where(models.CourseClass.course_code == course_code).limit(1))
+        total = db.scalar(select(models.Attendance.id).order_by(models.Attendance.id.desc()).limit(1))
+        print(f"attendance rows: ~{total}")
+
+        queries = {
+            "attendance by student": select(models.Attendance).where(models.Attendance.student_id == student_id),
+            "attendance by class": select(models.Attendance).where(models.Attendance.course_class_id == class_id),
+            "attendance by class and student": select(models.Attendance).where(
+                models.Attendance.course_class_id == class_id, models.Attendance.student_id == student_id),
+            "enrollments by course": select(models.Enrollment).where(models.Enrollment.course_code == course_code),
+            "enrollments by student": select(models.Enrollment).where(models.Enrollment.student_id == student_id),
+            "enrollment by course and student": select(models.Enrollment).where(
+                models.Enrollment.course_code == course_code, models.Enrollment.student_id == student_id),
+            "classes by course": select(models.CourseClass).where(models.CourseClass.course_code == course_code),
+            "courses by instructor": select(models.Course).where(models.Course.instructor_id == instructor_id),
+            "users by role": select(models.User).where(models.User.role == "instructor"),
+        }
+        for name, statement in queries.items():
+            print(f"\n{name}: {timed(db, statement):.3f} ms")
+            for line in explain(db, statement):
+                print(f"    {line}")
+    finally:
+        remove_prefixed(db, PREFIX)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Login storm: a whole campus logs in at once while a probe keeps calling GET /auth/me with a
+# token. Login latency shows the cost of the password KDF spread over the hashing pool; the probe
+# latency shows whether the event loop stays responsive meanwhile (it should stay in milliseconds,
+# since hashing never runs on the loop and token checks are a cache lookup).
+#
+# run "python -m benchmarks.bench_login --users 500" (starts the app with uvicorn on a free port)
+# or  "python -m benchmarks.bench_login --url http://127.0.0.1:8000" (a running server on the same database)
+# the server's AUTH_SCRYPT_N / AUTH_HASH_WORKERS / AUTH_MAX_PENDING set the cost and pool being measured
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from backend import auth, models
+from backend.database import SessionLocal, engine
+from benchmarks.dataset import remove_prefixed, seed_prefixed
+from benchmarks.server import serve
+
+PREFIX = "bench-login"
+PASSWORD = "correct horse battery staple"
+
+
+def setup(db, users):
+    # one hash shared by every user keeps setup fast; each login still runs a full verification
+    _, ids = seed_prefixed(db, PREFIX, users, password=auth.hash_password(PASSWORD))
+    return ids
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] if sorted_values else float("nan")
+
+
+async def storm(url, ids, concurrency):
+    limits = httpx.Limits(max_connections=concurrency + 2, max_keepalive_connections=concurrency + 2)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        token = (await client.post("/auth/login", json={"id": ids[0], "password": PASSWORD})).json()["access_token"]
+        login_latencies, probe_latencies, statuses = [], [], {}
+        done = asyncio.Event()
+        gate = asyncio.Semaphore(concurrency)
+
+        async def login(user_id):
+            async with gate:
+                start = time.perf_counter()
+                response = await client.post("/auth/login", json={"id": user_id, "password": PASSWORD})
+                login_latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                (await client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})).raise_for_status()
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        probing = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(user_id) for user_id in ids))
+        wall = time.perf_counter() - started
+        done.set()
+        await probing
+
+    login_latencies.sort()
+    probe_latencies.sort()
+    print(f"{len(ids)} logins at concurrency {concurrency} in {wall:.2f}s ({len(ids) / wall:.0f}/s), statuses {statuses}")
+    print(f"login  p50 {percentile(login_latencies, 0.5) * 1000:.0f} ms  p95 {percentile(login_latencies, 0.95) * 1000:.0f} ms  "
+          f"p99 {percentile(login_latencies, 0.99) * 1000:.0f} ms")
+    print(f"probe  p50 {percentile(probe_latencies, 0.5) * 1000:.1f} ms  p99 {percentile(probe_latencies, 0.99) * 1000:.1f} ms  "
+          f"max {probe_latencies[-1] * 1000:.1f} ms over {len(probe_latencies)} requests")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="base url of a running server; defaults to serving the app with uvicorn")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    server = None
+    try:
+        remove_prefixed(db, PREFIX)
+        ids = setup(db, args.users)
+        url = args.url
+        if url is None:
+            url, server = serve()
+        asyncio.run(storm(url, ids, args.concurrency))
+    finally:
+        if server is not None:
+            server.should_exit = True
+        remove_prefixed(db, PREFIX)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# Load test for the roll-call push channel: opens many concurrent GET /course_classes/{id}/events
+# streams, then repeatedly flips the whole class with PUT /attendance/batch and measures how long
+# each mark takes to reach every subscriber. Also prints the request rate the same screens would
+# put on the API by polling instead.
+#
+# run "python -m benchmarks.bench_realtime --subscribers 2000" (starts the app with uvicorn on a free port)
+# or  "python -m benchmarks.bench_realtime --url http://127.0.0.1:8000" (a running server on the same database)
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.server import serve
+
+PREFIX = "bench-rt"
+COURSE = f"{PREFIX}-course"
+STUDENTS = 30
+
+
+async def setup(client):
+    students = [f"{PREFIX}-student-{i}" for i in range(STUDENTS)]
+    await client.post("/users/", json={"id": f"{PREFIX}-instructor", "password": "x", "role": "instructor", "name": "bench"})
+    for student in students:
+        await client.post("/users/", json={"id": student, "password": "x", "role": "student", "name": "bench"})
+    await client.post("/courses/", json={"code": COURSE, "title": "bench", "instructor_id": f"{PREFIX}-instructor"})
+    for student in students:
+        await client.post("/enrollments/", json={"course_code": COURSE, "student_id": student})
+    await client.post("/course_classes/", json={"course_code": COURSE, "date_time": "2030-01-01T09:00:00"})
+    return (await client.get("/course_classes/", params={"course_code": COURSE})).json()["items"][0]["id"]
+
+
+async def teardown(client):
+    await client.delete(f"/courses/{COURSE}")
+    await client.delete(f"/users/{PREFIX}-instructor")
+    for i in range(STUDENTS):
+        await client.delete(f"/users/{PREFIX}-student-{i}")
+
+
+async def subscriber(client, class_id, ready, arrivals, resyncs):
+    async with client.stream("GET", f"/course_classes/{class_id}/events") as response:
+        async for line in response.aiter_lines():
+            if line.startswith("retry:"):
+                ready.release()
+            elif line == "event: resync":
+                resyncs.append(1)
+            elif line.startswith("data:") and line != "data: {}":
+                arrivals.append(time.perf_counter())
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def run(url, subscribers, rounds, poll_interval):
+    limits = httpx.Limits(max_connections=subscribers + 10, max_keepalive_connections=subscribers + 10)
+    async with httpx.AsyncClient(base_url=url, timeout=None, limits=limits) as client:
+        await teardown(client)
+        class_id = await setup(client)
+        try:
+            ready = asyncio.Semaphore(0)
+            arrivals = [[] for _ in range(subscribers)]
+            resyncs = []
+            started = time.perf_counter()
+            tasks = [asyncio.create_task(subscriber(client, class_id, ready, arrivals[i], resyncs)) for i in range(subscribers)]
+            for _ in range(subscribers):
+                await ready.acquire()
+            connect_seconds = time.perf_counter() - started
+
+            sent = []
+            for k in range(rounds):
+                # alternately everyone present and everyone absent, so every round changes every mark
+                absent = [] if k % 2 == 0 else [f"{PREFIX}-student-{i}" for i in range(STUDENTS)]
+                sent.append(time.perf_counter())
+                response = await client.put("/attendance/batch", json={"course_class_id": class_id, "all_present_except": absent})
+                response.raise_for_status()
+                deadline = time.perf_counter() + 10
+                while any(len(a) <= k for a in arrivals) and time.perf_counter() < deadline:
+                    await asyncio.sleep(0.005)
+
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            await teardown(client)
+
+    latencies = sorted(a[k] - sent[k] for a in arrivals for k in range(min(len(a), rounds)))
+    expected = subscribers * rounds
+    print(f"{subscribers} subscribers connected in {connect_seconds:.2f}s")
+    print(f"{rounds} roll calls: {len(latencies)}/{expected} deliveries, {len(resyncs)} resyncs")
+    print(f"delivery latency p50 {percentile(latencies, 0.5) * 1000:.1f} ms  p95 {percentile(latencies, 0.95) * 1000:.1f} ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms  max {latencies[-1] * 1000:.1f} ms")
+    print(f"polling every {poll_interval:g}s instead would cost {subscribers / poll_interval:.0f} requests/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="base url of a running server; defaults to serving the app with uvicorn")
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--poll-interval", type=float, default=3, help="seconds between polls of the client this replaces")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        url, server = serve()
+    try:
+        asyncio.run(run(url, args.subscribers, args.rounds, args.poll_interval))
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
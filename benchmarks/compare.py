@@ -0,0 +1,31 @@
+# Compares two benchmarks.load result files scenario by scenario.
+#
+# run "python -m benchmarks.compare base.json head.json"
+
+import json
+import sys
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "throughput_rps", "queries_per_request"]
+
+
+def main():
+    with open(sys.argv[1]) as f:
+        base = json.load(f)
+    with open(sys.argv[2]) as f:
+        head = json.load(f)
+    print(f"base {base.get('commit')}  head {head.get('commit')}")
+    print(f"{'scenario':>15} {'metric':>20} {'base':>10} {'head':>10} {'change':>8}")
+    for name, result in head["scenarios"].items():
+        previous = base["scenarios"].get(name)
+        if previous is None:
+            continue
+        for metric in METRICS:
+            old, new = previous.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"{name:>15} {metric:>20} {old:>10.2f} {new:>10.2f} {change:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Generates a reproducible synthetic campus into the configured database: instructors, students,
+# courses, enrollments, classes and their attendance rows, plus the aggregate counters.
+# Attendance rows = courses x classes per course x students per course (about 80% of that with
+# ATTENDANCE_STORAGE=lazy, which only stores the present marks).
+#
+# run "python -m benchmarks.dataset --students 50000 --courses 2000 --classes-per-course 50 --students-per-course 50 --reset"
+# (that is ~5M attendance rows; point DATABASE_URL at a scratch sqlite file or local mariadb)
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from backend import aggregates, models, storage
+from backend.database import SessionLocal, engine
+
+CHUNK = 5000
+
+
+def chunks(rows, size=CHUNK):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def seed_prefixed(db, prefix, students, course_codes=(), students_per_course=None, spread=0, password="x"):
+    # the small fixtures of the other benchmarks, which add and remove their own rows next to any data:
+    # students "<prefix>-student-<i>", an instructor "<prefix>-instructor" teaching course_codes, and
+    # students_per_course (default all) students enrolled in each course, course i from student i * spread
+    instructor = f"{prefix}-instructor"
+    student_ids = [f"{prefix}-student-{i}" for i in range(students)]
+    users = [{"id": s, "password": password, "role": "student", "name": "bench"} for s in student_ids]
+    if course_codes:
+        users.append({"id": instructor, "password": password, "role": "instructor", "name": "bench"})
+    for rows in chunks(users):
+        db.execute(insert(models.User), rows)
+    for rows in chunks([{"user_id": s} for s in student_ids]):
+        db.execute(insert(models.Student), rows)
+    if course_codes:
+        db.execute(insert(models.Instructor), [{"user_id": instructor}])
+        db.execute(insert(models.Course), [{"code": c, "title": "bench", "instructor_id": instructor} for c in course_codes])
+        per_course = students if students_per_course is None else students_per_course
+        enrollments = [{"course_code": c, "student_id": student_ids[(i * spread + j) % students]}
+                       for i, c in enumerate(course_codes) for j in range(per_course)]
+        for rows in chunks(enrollments):
+            db.execute(insert(models.Enrollment), rows)
+    db.commit()
+    return instructor, student_ids
+
+def remove_prefixed(db, prefix):
+    # everything seed_prefixed created, and what hangs off it, goes with the users
+    db.execute(delete(models.User).where(models.User.id.like(f"{prefix}-%")))
+    db.commit()
+
+
+def generate(db, students, courses, instructors, classes_per_course, students_per_course, seed=1, start=datetime(2024, 1, 8, 8)):
+    rng = random.Random(seed)
+    instructor_ids = [f"instructor-{i}" for i in range(instructors)]
+    student_ids = [f"student-{i}" for i in range(students)]
+    course_codes = [f"course-{i}" for i in range(courses)]
+
+    users = [{"id": u, "password": "x", "role": "instructor", "name": u} for u in instructor_ids]
+    users += [{"id": u, "password": "x", "role": "student", "name": u} for u in student_ids]
+    for rows in chunks(users):
+        db.execute(insert(models.User), rows)
+    for rows in chunks([{"user_id": u} for u in instructor_ids]):
+        db.execute(insert(models.Instructor), rows)
+    for rows in chunks([{"user_id": u} for u in student_ids]):
+        db.execute(insert(models.Student), rows)
+    for rows in chunks([{"code": c, "title": c, "instructor_id": rng.choice(instructor_ids)} for c in course_codes]):
+        db.execute(insert(models.Course), rows)
+
+    enrollments = [{"course_code": c, "student_id": s} for c in course_codes for s in rng.sample(student_ids, min(students_per_course, students))]
+    for rows in chunks(enrollments):
+        db.execute(insert(models.Enrollment), rows)
+
+    # classes on a weekly timetable: each course meets at a random weekday slot and hour
+    classes = []
+    for c in course_codes:
+        slot = start + timedelta(days=rng.randrange(5), hours=rng.randrange(10))
+        classes += [{"course_code": c, "date_time": slot + timedelta(days=7 * (k // 3), hours=2 * (k % 3))} for k in range(classes_per_course)]
+    for rows in chunks(classes):
+        db.execute(insert(models.CourseClass), rows)
+    db.commit()
+
+    # attendance per course batch with INSERT ... SELECT; roughly 80% present, deterministic per row.
+    # lazy storage only keeps the marked (present) ones, the absences are derived
+    present = (models.Enrollment.id * 7 + models.CourseClass.id * 13) % 5 != 0
+    for batch in chunks(course_codes, 50):
+        seed_rows = (
+            select(models.Enrollment.student_id, models.CourseClass.id, present)
+            .join(models.CourseClass, models.CourseClass.course_code == models.Enrollment.course_code)
+            .where(models.Enrollment.course_code.in_(batch))
+        )
+        if storage.LAZY:
+            seed_rows = seed_rows.where(present)
+        db.execute(insert(models.Attendance).from_select(["student_id", "course_class_id", "present"], seed_rows))
+        db.commit()
+    aggregates.rebuild(db, repair=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--instructors", type=int, default=None)
+    parser.add_argument("--classes-per-course", type=int, default=50)
+    parser.add_argument("--students-per-course", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate every table first")
+    args = parser.parse_args()
+
+    if args.reset:
+        models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if db.scalar(select(func.count()).select_from(models.User)):
+            parser.error("database is not empty; pass --reset to replace its contents")
+        started = time.perf_counter()
+        generate(db, args.students, args.courses, args.instructors or max(1, args.courses // 4),
+                 args.classes_per_course, args.students_per_course, seed=args.seed)
+        rows = db.scalar(select(func.count()).select_from(models.Attendance))
+        print(f"generated {rows} attendance rows in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# Drives the API through its real routes against a dataset from benchmarks.dataset and writes
+# p50/p95/p99 latency, throughput and DB queries per request for each scenario as JSON, so runs
+# can be compared across commits with benchmarks.compare.
+#
+# run "python -m benchmarks.load --out results.json" (the app served with uvicorn on the configured database)
+# or  "python -m benchmarks.load --url http://127.0.0.1:8000 --out results.json" (a running server)
+
+import argparse
+import json
+import random
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import httpx
+
+from benchmarks.server import serve
+
+METRIC = re.compile(r'^(http_request_db_(?:queries|seconds)_(?:sum|count))\{method="(\w+)",route="([^"]*)"\} (\S+)$')
+
+
+class Target:
+    def __init__(self, url):
+        self._local = threading.local()
+        self.url = url
+
+    @property
+    def client(self):
+        # one client per worker thread, all against the same server: a TestClient per thread would
+        # run an event loop each around the one shared async engine
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = httpx.Client(base_url=self.url, timeout=120)
+            self._local.client = client
+        return client
+
+
+def db_totals(target):
+    # sums of the per-request query histograms from /metrics, ignoring the scrape itself
+    totals = {}
+    for line in target.client.get("/metrics").text.splitlines():
+        match = METRIC.match(line)
+        if match and match.group(3) != "/metrics":
+            totals[match.group(1)] = totals.get(match.group(1), 0) + float(match.group(4))
+    return totals
+
+
+def sample_ids(target, path, key, params=None, pages=5):
+    ids, cursor = [], None
+    for _ in range(pages):
+        page = target.client.get(path, params={**(params or {}), "limit": 1000, **({"cursor": cursor} if cursor else {})}).json()
+        ids += [item[key] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    return ids
+
+
+def scenarios(ids, rng):
+    def rollcall():
+        # everyone present except a few; absentees outside the class come back as not_found
+        absent = rng.sample(ids["students"], 3)
+        return "put", "/attendance/batch", {"json": {"course_class_id": rng.choice(ids["classes"]), "all_present_except": absent}}
+
+    def dashboard():
+        student = rng.choice(ids["students"])
+        path = rng.choice([f"/stats/students/{student}", f"/attendance/student/{student}", f"/enrollments/student/{student}"])
+        return "get", path, {}
+
+    def course_page():
+        return "get", f"/courses/code/{rng.choice(ids['courses'])}", {"params": {"expand": "course_classes"}}
+
+    def class_creation():
+        when = datetime(2030, 1, 1) + timedelta(minutes=rng.randrange(10 ** 6))
+        return "post", "/course_classes/", {"json": {"course_code": rng.choice(ids["courses"]), "date_time": when.isoformat()}}
+
+    def export():
+        return "get", "/attendance/export", {"params": {"course_code": rng.choice(ids["courses"])}}
+
+    return {"rollcall": rollcall, "dashboard": dashboard, "course_page": course_page, "class_creation": class_creation, "export": export}
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run(target, make_request, requests, concurrency):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        method, path, kwargs = make_request()
+        start = time.perf_counter()
+        response = getattr(target.client, method)(path, **kwargs)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code >= 400:
+                errors += 1
+
+    before = db_totals(target)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    after = db_totals(target)
+
+    latencies.sort()
+    handled = after.get("http_request_db_queries_count", 0) - before.get("http_request_db_queries_count", 0)
+    queries = after.get("http_request_db_queries_sum", 0) - before.get("http_request_db_queries_sum", 0)
+    sql_seconds = after.get("http_request_db_seconds_sum", 0) - before.get("http_request_db_seconds_sum", 0)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "throughput_rps": requests / wall,
+        "queries_per_request": queries / handled if handled else None,
+        "sql_ms_per_request": sql_seconds * 1000 / handled if handled else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="base url of a running server; defaults to serving the app with uvicorn")
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenario", action="append", help="run only these scenarios (repeatable)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args()
+
+    url, server = args.url, None
+    if url is None:
+        url, server = serve()
+    try:
+        target = Target(url)
+        rng = random.Random(args.seed)
+        ids = {
+            "students": sample_ids(target, "/users/", "id", {"role": "student"}),
+            "courses": sample_ids(target, "/courses", "code"),
+            "classes": sample_ids(target, "/course_classes/", "id"),
+        }
+        selected = scenarios(ids, rng)
+        results = {"commit": git_commit(), "timestamp": datetime.now().isoformat(), "concurrency": args.concurrency, "scenarios": {}}
+        for name, make_request in selected.items():
+            if args.scenario and name not in args.scenario:
+                continue
+            result = run(target, make_request, args.requests, args.concurrency)
+            results["scenarios"][name] = result
+            print(f"{name:>15}: p50 {result['p50_ms']:.1f} ms  p95 {result['p95_ms']:.1f} ms  p99 {result['p99_ms']:.1f} ms  "
+                  f"{result['throughput_rps']:.0f} req/s  {result['queries_per_request'] or 0:.1f} queries/req  errors {result['errors']}")
+    finally:
+        if server is not None:
+            server.should_exit = True
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+# Serves backend.main:app with uvicorn on a free local port in a background thread, for the
+# benchmarks that need real concurrent HTTP connections rather than a TestClient.
+
+import socket
+import threading
+import time
+
+
+def serve():
+    import uvicorn
+
+    from backend.main import app
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning", timeout_keep_alive=600))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
@@ -0,0 +1,56 @@
+# The backend binds its engines when first imported, so the database is chosen here, before any
+# test module imports it: a throwaway sqlite file, never the configured DATABASE_URL.
+
+import os
+import tempfile
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pytest
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='attendance-tests-')}/test.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("REPLICA_DATABASE_URLS", None)
+
+Course = namedtuple("Course", ["code", "instructor", "students", "class_ids"])
+
+
+@pytest.fixture
+def db():
+    from backend.database import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    from backend.main import app
+
+    return TestClient(app)
+
+@pytest.fixture
+def make_course(request, db):
+    # a course with enrolled students and classes under a prefix of the test module's name. The
+    # classes are created by crud, so each storage mode seeds (or derives) their attendance its own
+    # way; everything goes with the prefixed users afterwards
+    from backend import crud, schemas
+    from benchmarks.dataset import remove_prefixed, seed_prefixed
+
+    prefix = request.module.__name__.rsplit(".", 1)[-1].replace("_", "-")
+    remove_prefixed(db, prefix)
+    made = []
+
+    def make(students=4, classes=2, start=datetime(2026, 1, 5, 9)):
+        code = f"{prefix}-course-{len(made)}"
+        instructor, student_ids = seed_prefixed(db, f"{prefix}-{len(made)}", students, [code])
+        class_ids = [crud.create_course_class(db, schemas.CourseClassCreate(course_code=code, date_time=start + timedelta(days=i))).id
+                     for i in range(classes)]
+        made.append(Course(code, instructor, student_ids, class_ids))
+        return made[-1]
+
+    yield make
+    db.rollback()
+    remove_prefixed(db, prefix)
@@ -0,0 +1,44 @@
+# Analytics reports are cached under a key built from the term's class revisions and the roster,
+# so a mark or a rename shows in the next report instead of the cached one.
+
+from backend import analytics
+
+
+def below(client, code=None):
+    response = client.get("/analytics/below_threshold", params={"course_code": code} if code else {})
+    assert response.status_code == 200, response.text
+    return sorted(row["student_id"] for row in response.json())
+
+def rename(client, user_id, role):
+    new = f"{user_id}-renamed"
+    client.put(f"/users/{user_id}", json={"id": new, "role": role, "name": "renamed"}).raise_for_status()
+    return new
+
+
+def test_mark_changes_the_report(client, make_course):
+    course = make_course(students=3)
+    assert below(client, course.code) == sorted(course.students)
+    for class_id in course.class_ids:
+        client.put("/attendance/batch", json={"course_class_id": class_id, "present": course.students[:1]}).raise_for_status()
+    assert below(client, course.code) == sorted(course.students[1:])
+
+def test_renamed_student_is_not_served_from_the_cache(client, make_course):
+    course = make_course(students=3)
+    assert below(client, course.code) == sorted(course.students)
+    assert course.students[0] in below(client)
+
+    new = rename(client, course.students[0], "student")
+
+    assert below(client, course.code) == sorted([new, *course.students[1:]])
+    everyone = below(client)
+    assert new in everyone and course.students[0] not in everyone
+
+def test_renamed_instructor_is_not_served_from_the_cache(db, client, make_course):
+    course = make_course()
+    assert course.instructor in [row[0] for row in analytics.instructors(db)]
+
+    new = rename(client, course.instructor, "instructor")
+
+    db.expire_all()
+    instructors = [row[0] for row in analytics.instructors(db)]
+    assert new in instructors and course.instructor not in instructors
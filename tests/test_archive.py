@@ -0,0 +1,46 @@
+# Archiving moves a closed term's attendance into attendance_archive and restoring moves it back;
+# the counters already include archived rows, and seeding a class never adds a second row next to
+# an archived one.
+
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from backend import aggregates, archive, crud, models
+
+START = datetime(2019, 3, 4, 9)
+
+
+def rows(db, table, class_ids):
+    return db.scalar(select(func.count()).select_from(table).where(table.c.course_class_id.in_(class_ids)))
+
+def assert_no_drift(db):
+    db.commit()
+    assert aggregates.rebuild(db) == {"student_course": 0, "course_class": 0}
+
+
+def test_archive_and_restore(db, client, make_course):
+    course = make_course(classes=2, start=START)
+    client.put("/attendance/batch", json={"course_class_id": course.class_ids[0], "present": course.students[:2]}).raise_for_status()
+
+    assert archive.archive(db, before=datetime(2019, 3, 5), after=START) == 4
+    # only the first class is in the range; with lazy storage its unmarked cells are stored first
+    closed = course.class_ids[:1]
+    assert (rows(db, archive.live, closed), rows(db, archive.archived, closed)) == (0, 4)
+    assert_no_drift(db)
+    stats = client.get(f"/stats/course_classes/{course.class_ids[0]}").json()
+    assert (stats["present"], stats["total"]) == (2, 4)
+
+    assert archive.restore(db, before=datetime(2019, 3, 5), after=START) == 4
+    assert (rows(db, archive.live, closed), rows(db, archive.archived, closed)) == (4, 0)
+    assert_no_drift(db)
+
+def test_seeding_skips_archived_rows(db, client, make_course):
+    course = make_course(classes=1, start=START)
+    archive.archive(db, before=datetime(2019, 3, 5), after=START)
+
+    assert crud.seed_course_class(db, course.class_ids[0]) == 0
+    assert rows(db, archive.live, course.class_ids) == 0
+    assert_no_drift(db)
+    stats = client.get(f"/stats/course_classes/{course.class_ids[0]}").json()
+    assert stats["total"] == 4
@@ -0,0 +1,62 @@
+# PUT /attendance/batch reports per student what it did, and a retried batch changes nothing the
+# second time: not the rows, not the counters.
+
+
+def put(client, class_id, **body):
+    response = client.put("/attendance/batch", json={"course_class_id": class_id, **body})
+    assert response.status_code == 200, response.text
+    return {result["student_id"]: result["status"] for result in response.json()}
+
+def present(client, class_id):
+    return {cell["student_id"] for cell in client.get(f"/attendance/course_class_id/{class_id}").json() if cell["present"]}
+
+def class_stats(client, class_id):
+    stats = client.get(f"/stats/course_classes/{class_id}").json()
+    return stats["present"], stats["total"]
+
+
+def test_present_and_absent_lists_are_idempotent(client, make_course):
+    course = make_course()
+    class_id = course.class_ids[0]
+    s = course.students
+    body = {"present": s[:2], "absent": [s[2]]}
+
+    assert put(client, class_id, **body) == {s[0]: "updated", s[1]: "updated", s[2]: "unchanged"}
+    assert present(client, class_id) == set(s[:2])
+    assert class_stats(client, class_id) == (2, 4)
+
+    assert put(client, class_id, **body) == {s[0]: "unchanged", s[1]: "unchanged", s[2]: "unchanged"}
+    assert present(client, class_id) == set(s[:2])
+    assert class_stats(client, class_id) == (2, 4)
+
+def test_all_present_except_is_idempotent(client, make_course):
+    course = make_course()
+    class_id = course.class_ids[1]
+    s = course.students
+    put(client, class_id, present=[s[3]])
+
+    assert put(client, class_id, all_present_except=[s[3]]) == {s[0]: "updated", s[1]: "updated", s[2]: "updated", s[3]: "updated"}
+    assert present(client, class_id) == set(s[:3])
+    assert put(client, class_id, all_present_except=[s[3]]) == dict.fromkeys(s, "unchanged")
+    assert class_stats(client, class_id) == (3, 4)
+    # the other class is untouched
+    assert present(client, course.class_ids[0]) == set()
+
+def test_students_without_a_cell_are_not_found(client, make_course):
+    course = make_course()
+    other = make_course(students=1)
+    class_id = course.class_ids[0]
+
+    result = put(client, class_id, present=[course.students[0], other.students[0], "nobody"])
+    assert result == {course.students[0]: "updated", other.students[0]: "not_found", "nobody": "not_found"}
+    result = put(client, class_id, all_present_except=["nobody"])
+    assert result["nobody"] == "not_found"
+    assert present(client, class_id) == set(course.students)
+    assert class_stats(client, class_id) == (4, 4)
+
+def test_rejected_batches(client, make_course):
+    course = make_course()
+    s = course.students
+    assert client.put("/attendance/batch", json={"course_class_id": course.class_ids[0], "present": [s[0]], "absent": [s[0]]}).status_code == 400
+    assert client.put("/attendance/batch", json={"course_class_id": course.class_ids[0], "present": [s[0]], "all_present_except": []}).status_code == 400
+    assert client.put("/attendance/batch", json={"course_class_id": -1, "present": [s[0]]}).status_code == 404
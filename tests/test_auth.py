@@ -0,0 +1,73 @@
+# Logging in checks the scrypt hash (or a legacy plaintext password, which it then replaces with a
+# hash) and hands out a bearer token that logout or a change to the user revokes.
+
+import pytest
+from sqlalchemy import update
+
+from backend import auth, models
+
+
+def login(client, user_id, password):
+    return client.post("/auth/login", json={"id": user_id, "password": password})
+
+def me(client, token):
+    return client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+def stored_password(db, user_id):
+    db.expire_all()
+    return db.get(models.User, user_id).password
+
+def set_password(db, user_id, password):
+    db.execute(update(models.User).where(models.User.id == user_id).values(password=password))
+    db.commit()
+
+
+def test_login_and_logout(client, make_course):
+    course = make_course(students=1, classes=0)
+    student = course.students[0]
+    # seed_prefixed stores plaintext; the first login hashes it
+    token = login(client, student, "x").json()["access_token"]
+
+    assert me(client, token).json() == {"user_id": student, "role": "student"}
+    assert client.post("/auth/logout", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert me(client, token).status_code == 401
+
+def test_wrong_or_unknown_credentials(client, make_course):
+    course = make_course(students=1, classes=0)
+    assert login(client, course.students[0], "wrong").status_code == 401
+    assert login(client, "nobody", "x").status_code == 401
+    assert me(client, "not-a-token").status_code == 401
+    assert client.get("/auth/me").status_code == 401
+
+@pytest.mark.parametrize("legacy", ["x", "scrypt$not-a-hash", "scrypt$a$b$c$d$e", "scrypt$3$1$1$AAAA$AAAA"])
+def test_legacy_password_is_rehashed(db, client, make_course, legacy):
+    course = make_course(students=1, classes=0)
+    student = course.students[0]
+    set_password(db, student, legacy)
+
+    assert login(client, student, legacy).status_code == 200
+    assert stored_password(db, student).startswith(f"scrypt${auth.SCRYPT_N}${auth.SCRYPT_R}${auth.SCRYPT_P}$")
+    assert login(client, student, legacy).status_code == 200
+    assert login(client, student, "wrong").status_code == 401
+
+def test_busy_pool_skips_the_rehash(db, client, make_course, monkeypatch):
+    course = make_course(students=1, classes=0)
+    student = course.students[0]
+
+    async def busy(password):
+        raise auth.Busy()
+    monkeypatch.setattr(auth, "hash_password_async", busy)
+
+    assert login(client, student, "x").status_code == 200
+    assert stored_password(db, student) == "x"
+
+def test_changing_the_user_revokes_tokens(client, make_course):
+    course = make_course(students=1, classes=0)
+    student = course.students[0]
+    token = login(client, student, "x").json()["access_token"]
+    assert me(client, token).status_code == 200
+
+    client.put(f"/users/{student}", json={"id": student, "role": "student", "name": "renamed"}).raise_for_status()
+
+    assert me(client, token).status_code == 401
+    assert me(client, login(client, student, "x").json()["access_token"]).status_code == 200
@@ -0,0 +1,57 @@
+# Users, courses and rosters are served from the cache until a write invalidates them. Renaming a
+# user cascades the new id into the course and roster rows, so their cached copies must go too, and
+# a deleted user must not come back from the cache.
+
+import json
+
+from backend import cache, crud
+
+
+def roster(client, code):
+    return sorted(enrollment["student_id"] for enrollment in client.get(f"/enrollments/code/{code}").json())
+
+def cached(namespace, key):
+    raw = cache.backend.get(f"{namespace}:{key}")
+    return None if raw is None else json.loads(raw)
+
+
+def test_renaming_a_student(client, make_course):
+    course = make_course()
+    old = course.students[0]
+    new = f"{old}-renamed"
+    assert client.get(f"/users/{old}").status_code == 200
+    assert old in roster(client, course.code)
+    assert cached("user", old) is not None and cached("roster", course.code) is not None
+
+    response = client.put(f"/users/{old}", json={"id": new, "role": "student", "name": "renamed"})
+    assert response.status_code == 200, response.text
+
+    assert client.get(f"/users/{old}").status_code == 404
+    assert client.get(f"/users/{new}").json()["name"] == "renamed"
+    assert roster(client, course.code) == sorted([new, *course.students[1:]])
+
+def test_renaming_an_instructor(db, client, make_course):
+    course = make_course()
+    new = f"{course.instructor}-renamed"
+    assert crud.get_course_by_code(db, course.code).instructor_id == course.instructor
+    db.close()
+
+    client.put(f"/users/{course.instructor}", json={"id": new, "role": "instructor", "name": "renamed"}).raise_for_status()
+
+    assert crud.get_course_by_code(db, course.code).instructor_id == new
+
+def test_deleting_a_student(client, make_course):
+    course = make_course()
+    gone = course.students[1]
+    assert client.get(f"/users/{gone}").status_code == 200
+    assert gone in roster(client, course.code)
+
+    client.delete(f"/users/{gone}").raise_for_status()
+
+    assert client.get(f"/users/{gone}").status_code == 404
+    assert gone not in roster(client, course.code)
+
+def test_password_hashes_stay_out_of_the_cache(client, make_course):
+    course = make_course()
+    client.get(f"/users/{course.students[0]}").raise_for_status()
+    assert cached("user", course.students[0])["columns"].keys() == {"id", "role", "name"}
@@ -0,0 +1,75 @@
+# The attendance counters are kept by deltas on every write; aggregates.rebuild recounts them from
+# the attendance and reports how many counter rows disagree, which must stay zero after each kind
+# of write and after a migration fills them on an existing database.
+
+from sqlalchemy import delete
+
+from backend import aggregates, crud, migrations, models, schemas
+
+
+def assert_no_drift(db):
+    db.commit()
+    assert aggregates.rebuild(db) == {"student_course": 0, "course_class": 0}
+
+def mark(client, class_id, **body):
+    assert client.put("/attendance/batch", json={"course_class_id": class_id, **body}).status_code == 200
+
+
+def test_marks(db, client, make_course):
+    course = make_course(classes=3)
+    s = course.students
+    mark(client, course.class_ids[0], present=s[:3])
+    mark(client, course.class_ids[1], all_present_except=[s[0]])
+    mark(client, course.class_ids[0], absent=[s[1]])
+    cell = client.get("/attendance/", params={"course_class_id": course.class_ids[2], "student_id": s[2]}).json()["items"][0]
+    assert client.put(f"/attendance/{cell['id']}", params={"present": True}).status_code == 200
+
+    assert_no_drift(db)
+    stats = client.get(f"/stats/students/{s[2]}/courses/{course.code}").json()
+    assert (stats["present"], stats["total"]) == (3, 3)
+
+def test_seeding(db, client, make_course):
+    course = make_course(classes=1)
+    # a class left for the background seeding job, and a student enrolled after the classes exist
+    late = crud.create_course_class(db, schemas.CourseClassCreate(course_code=course.code, date_time="2026-02-02T09:00:00"), seed=False)
+    crud.seed_course_class(db, late.id, batch_size=3)
+    assert_no_drift(db)
+    crud.seed_course_class(db, late.id)
+    stats = client.get(f"/stats/course_classes/{late.id}").json()
+    assert (stats["present"], stats["total"]) == (0, 4)
+
+    # lazy storage derives the newcomer's cells in the existing classes, eager storage has none for them
+    other = make_course(students=1, classes=0)
+    crud.create_enrollment(db, schemas.EnrollmentCreate(student_id=other.students[0], course_code=course.code))
+    mark(client, late.id, present=[other.students[0]])
+    assert_no_drift(db)
+
+def test_deletes(db, client, make_course):
+    course = make_course(students=6, classes=3)
+    s = course.students
+    for class_id in course.class_ids:
+        mark(client, class_id, all_present_except=[s[5]])
+
+    enrollment = db.query(models.Enrollment).filter_by(course_code=course.code, student_id=s[0]).one()
+    crud.delete_enrollment(db, enrollment.id)
+    assert_no_drift(db)
+    crud.delete_course_class(db, course.class_ids[0])
+    assert_no_drift(db)
+    crud.delete_user(db, s[1])
+    assert_no_drift(db)
+    crud.delete_user_chunked(db, s[2], batch_size=1)
+    assert_no_drift(db)
+    crud.delete_user(db, course.instructor)
+    assert_no_drift(db)
+
+def test_migration_fills_empty_counters(db, client, make_course):
+    course = make_course(classes=2)
+    mark(client, course.class_ids[0], present=course.students[:2])
+    # a database from before the counter tables: classes and attendance, no counters
+    db.execute(delete(aggregates.student_stats))
+    db.execute(delete(aggregates.class_stats))
+    db.commit()
+
+    assert "attendance counters (rebuilt)" in migrations.upgrade()
+    assert_no_drift(db)
+    assert "attendance counters (rebuilt)" not in migrations.upgrade()
@@ -0,0 +1,98 @@
+# Background jobs go queued -> running -> succeeded or failed, with progress and the result kept for
+# GET /jobs/{id}; a sqlite job store hands the jobs a restart interrupted back to recover().
+
+import threading
+import time
+
+import pytest
+
+from backend import jobs
+
+
+def wait(store, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = store.get(job_id)
+        if job["finished_at"] is not None:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {store.get(job_id)['status']}")
+
+@pytest.fixture
+def kind(monkeypatch):
+    # registers a throwaway handler for one test
+    def register(fn):
+        monkeypatch.setitem(jobs.handlers, fn.__name__, fn)
+        return fn.__name__
+    return register
+
+
+def test_background_delete(client, make_course):
+    course = make_course()
+    response = client.delete(f"/users/{course.students[0]}", params={"background": True})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.json()["status_url"] == f"/jobs/{job_id}"
+
+    job = wait(jobs.queue.store, job_id)
+    assert job["status"] == "succeeded"
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "succeeded"
+    assert client.get(f"/jobs/{job_id}/result").json() == {"status": "succeeded", "result": {"user_id": course.students[0], "deleted": True}, "error": None}
+    assert client.get(f"/users/{course.students[0]}").status_code == 404
+
+def test_progress_and_unfinished_result(client, kind):
+    release = threading.Event()
+
+    @kind
+    def slow(db, progress):
+        progress(1, 2)
+        release.wait(10)
+        progress(2, 2)
+        return "done"
+
+    job_id = jobs.queue.submit(slow)
+    deadline = time.monotonic() + 10
+    while jobs.queue.store.get(job_id)["done"] != 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    job = client.get(f"/jobs/{job_id}").json()
+    assert (job["status"], job["done"], job["total"]) == ("running", 1, 2)
+    assert client.get(f"/jobs/{job_id}/result").status_code == 409
+
+    release.set()
+    assert wait(jobs.queue.store, job_id)["result"] == "done"
+    assert client.get(f"/jobs/{job_id}").json()["done"] == 2
+
+def test_failed_job(client, kind):
+    @kind
+    def broken(db, progress):
+        raise RuntimeError("boom")
+
+    job = wait(jobs.queue.store, jobs.queue.submit(broken))
+    assert (job["status"], job["error"]) == ("failed", "RuntimeError: boom")
+    assert client.get(f"/jobs/{job['id']}/result").json()["error"] == "RuntimeError: boom"
+    assert client.get("/jobs/nonexistent").status_code == 404
+
+def test_recover_reruns_interrupted_jobs(tmp_path, kind):
+    runs = []
+
+    @kind
+    def resumable(db, progress, n):
+        runs.append(n)
+        return n * 2
+
+    path = str(tmp_path / "jobs.db")
+    store = jobs.SqliteJobStore(path)
+    # what a restart finds: one job that was running, one still queued, one finished
+    for job_id, n, status, finished_at in (("running", 1, "running", None), ("queued", 2, "queued", None), ("finished", 3, "succeeded", 1.0)):
+        store.add({"id": job_id, "kind": resumable, "args": {"n": n}, "status": status, "done": 0, "total": None,
+                   "result": None, "error": None, "created_at": time.time(), "started_at": None, "finished_at": finished_at})
+
+    queue = jobs.JobQueue(jobs.SqliteJobStore(path))
+    queue.recover()
+    assert wait(queue.store, "running")["result"] == 2
+    assert wait(queue.store, "queued")["result"] == 4
+    assert sorted(runs) == [1, 2]
+    assert queue.store.get("finished")["result"] is None
+
+def test_memory_store_has_nothing_to_recover():
+    assert jobs.MemoryJobStore().unfinished() == []
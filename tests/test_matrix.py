@@ -0,0 +1,67 @@
+# The attendance matrix answers a conditional GET with 304 while nothing changed, and hands out a
+# new ETag once a mark or the roster changes it.
+
+import base64
+
+from sqlalchemy import event
+
+from backend import crud, schemas
+from backend.database import engine
+
+
+def matrix(client, code, etag=None, **params):
+    return client.get(f"/courses/{code}/attendance_matrix", params=params, headers={"If-None-Match": etag} if etag else {})
+
+def bit(bitset, index):
+    return base64.b64decode(bitset)[index >> 3] >> (7 - (index & 7)) & 1
+
+
+def test_unchanged_matrix_is_304(client, make_course):
+    course = make_course()
+    first = matrix(client, course.code)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    assert matrix(client, course.code, etag).status_code == 304
+    assert matrix(client, course.code, f'W/{etag}, "other"').status_code == 304
+    assert matrix(client, course.code, "*").status_code == 304
+    assert matrix(client, course.code, '"other"').status_code == 200
+    assert matrix(client, course.code, history=True).headers["ETag"] != etag
+
+def test_mark_changes_the_etag(client, make_course):
+    course = make_course()
+    etag = matrix(client, course.code).headers["ETag"]
+    student = sorted(course.students).index(course.students[2])
+    client.put("/attendance/batch", json={"course_class_id": course.class_ids[1], "present": [course.students[2]]}).raise_for_status()
+
+    changed = matrix(client, course.code, etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert bit(changed.json()["present"], student * len(course.class_ids) + 1)
+    assert matrix(client, course.code, changed.headers["ETag"]).status_code == 304
+
+def test_roster_change_changes_the_etag(db, client, make_course):
+    course = make_course()
+    other = make_course(students=1, classes=0)
+    etag = matrix(client, course.code).headers["ETag"]
+    crud.create_enrollment(db, schemas.EnrollmentCreate(student_id=other.students[0], course_code=course.code))
+
+    changed = matrix(client, course.code, etag)
+    assert changed.status_code == 200
+    assert other.students[0] in changed.json()["student_ids"]
+
+def test_stale_etag_reads_the_roster_and_classes_once(client, make_course):
+    course = make_course()
+    etag = matrix(client, course.code).headers["ETag"]
+    client.put("/attendance/batch", json={"course_class_id": course.class_ids[0], "present": [course.students[0]]}).raise_for_status()
+
+    issued = []
+    def record(*args):
+        issued.append(args[2])
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert matrix(client, course.code, etag).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    # the course lookup (unless cached), then roster, classes and cells
+    assert len(issued) <= 4, "\n".join(issued)
@@ -0,0 +1,39 @@
+# Cursors come from clients, so anything that doesn't decode to a key the list routes wrote must be
+# a 400, never a 500 from comparing a column with a JSON object.
+
+import base64
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import pagination
+from backend.main import app
+
+
+def cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+@pytest.mark.parametrize("value", ["student-1", 42])
+def test_round_trip(value):
+    assert pagination.decode_cursor(pagination.encode_cursor(value)) == value
+
+def test_composite_round_trip():
+    assert pagination.decode_cursor(pagination.encode_cursor([3, "student-1"]), (int, str)) == [3, "student-1"]
+
+@pytest.mark.parametrize("value", [{}, [], None, True, 1.5, [1]])
+def test_rejects_other_json(value):
+    with pytest.raises(ValueError):
+        pagination.decode_cursor(cursor(value))
+
+@pytest.mark.parametrize("value", [3, [3], ["3", "student-1"], [3, 4], [3, "student-1", 5], [True, "student-1"]])
+def test_rejects_other_composites(value):
+    with pytest.raises(ValueError):
+        pagination.decode_cursor(cursor(value), (int, str))
+
+@pytest.mark.parametrize("path", ["/users/", "/courses", "/enrollments", "/course_classes/", "/attendance/"])
+@pytest.mark.parametrize("raw", ["e30=", cursor([]), cursor(None), "not base64 !"])
+def test_routes_answer_400(path, raw):
+    response = TestClient(app).get(path, params={"cursor": raw})
+    assert response.status_code == 400, response.text
@@ -0,0 +1,66 @@
+# Counts the SQL statements each nested endpoint issues against a course with many classes and
+# fails if any goes over its budget, which catches N+1 loading regressions. The budgets hold
+# regardless of class count because every relationship is loaded with one SELECT ... IN.
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert, select
+
+from backend import models
+from backend.database import SessionLocal, engine
+from backend.main import app
+from benchmarks.dataset import remove_prefixed, seed_prefixed
+
+PREFIX = "test-qb"
+COURSE = f"{PREFIX}-course"
+CLASSES = 50
+STUDENTS = 20
+
+# (method, path, params, max statements)
+BUDGETS = [
+    ("get", f"/courses/code/{COURSE}", {}, 1),
+    ("get", f"/courses/code/{COURSE}", {"expand": "enrollments"}, 2),
+    ("get", f"/courses/code/{COURSE}", {"expand": "course_classes.attendance,enrollments"}, 4),
+    ("get", f"/courses/instructor/{PREFIX}-instructor", {"expand": "course_classes.attendance"}, 3),
+    ("get", f"/course_classes/{COURSE}", {}, 1),
+    ("get", f"/course_classes/{COURSE}", {"expand": "attendance"}, 2),
+    ("put", f"/courses/{COURSE}", {}, 8),
+]
+
+
+@pytest.fixture(scope="module")
+def course():
+    db = SessionLocal()
+    remove_prefixed(db, PREFIX)
+    seed_prefixed(db, PREFIX, STUDENTS, [COURSE])
+    db.execute(insert(models.CourseClass), [{"course_code": COURSE, "date_time": datetime(2024, 1, 1) + timedelta(days=i)} for i in range(CLASSES)])
+    seed = select(models.Enrollment.student_id, models.CourseClass.id, False).join(
+        models.CourseClass, models.CourseClass.course_code == models.Enrollment.course_code).where(models.Enrollment.course_code == COURSE)
+    db.execute(insert(models.Attendance).from_select(["student_id", "course_class_id", "present"], seed))
+    db.commit()
+    yield
+    remove_prefixed(db, PREFIX)
+    db.close()
+
+
+@pytest.fixture
+def statements():
+    issued = []
+    def record(*args):
+        issued.append(args[2])
+    event.listen(engine, "before_cursor_execute", record)
+    yield issued
+    event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.mark.parametrize("method, path, params, budget", BUDGETS)
+def test_query_budget(course, statements, method, path, params, budget):
+    client = TestClient(app)
+    if method == "put":
+        response = client.put(path, json={"code": COURSE, "title": "bench", "instructor_id": f"{PREFIX}-instructor"})
+    else:
+        response = client.get(path, params=params)
+    response.raise_for_status()
+    assert len(statements) <= budget, f"{method.upper()} {path} {params or ''} issued {len(statements)} statements:\n" + "\n".join(statements)
@@ -0,0 +1,82 @@
+# A RoutingSession reads from a replica until it writes; from then on it stays on the primary, so
+# it reads its own writes. primary_reads sends a block's reads to the primary without pinning, and
+# a replica that fails a read is marked down and the read retried on the primary.
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from backend.routing import ReplicaSet, RoutingSession, primary_reads
+
+
+class Base(DeclarativeBase):
+    pass
+
+class Row(Base):
+    __tablename__ = "row"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    source: Mapped[str]
+
+
+@pytest.fixture
+def engines(tmp_path):
+    # two databases told apart by the row they hold; the replica never sees the primary's writes
+    primary, replica = (create_engine(f"sqlite:///{tmp_path / name}.db") for name in ("primary", "replica"))
+    for engine, source in ((primary, "primary"), (replica, "replica")):
+        Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(insert(Row).values(id=1, source=source))
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+def session(primary, *replicas):
+    return RoutingSession(primary=primary, replicas=ReplicaSet(replicas))
+
+def source(db):
+    return db.scalar(select(Row.source).where(Row.id == 1))
+
+
+def test_reads_go_to_the_replica_until_a_flush(engines):
+    db = session(*engines)
+    assert source(db) == "replica"
+    assert db.get(Row, 1).source == "replica"
+
+    db.add(Row(id=2, source="new"))
+    db.flush()
+    assert db.scalar(select(Row.source).where(Row.id == 2)) == "new"
+    assert source(db) == "primary"
+    db.close()
+
+def test_writes_and_locking_reads_pin_to_the_primary(engines):
+    db = session(*engines)
+    db.execute(insert(Row).values(id=2, source="new"))
+    assert source(db) == "primary"
+    db.close()
+
+    db = session(*engines)
+    assert db.scalar(select(Row.source).where(Row.id == 1).with_for_update()) == "primary"
+    assert source(db) == "primary"
+    db.close()
+
+def test_primary_reads_does_not_pin(engines):
+    db = session(*engines)
+    with primary_reads(db):
+        assert source(db) == "primary"
+    assert source(db) == "replica"
+    db.close()
+
+def test_failed_replica_read_falls_back_to_the_primary(engines, tmp_path):
+    primary, _ = engines
+    empty = create_engine(f"sqlite:///{tmp_path / 'empty'}.db")
+    replicas = ReplicaSet([empty])
+    db = RoutingSession(primary=primary, replicas=replicas)
+    assert source(db) == "primary"
+    assert replicas.healthy == [False]
+    db.close()
+
+    # with no healthy replica left, reads start on the primary
+    db = RoutingSession(primary=primary, replicas=replicas)
+    assert source(db) == "primary"
+    db.close()
+    empty.dispose()
@@ -0,0 +1,72 @@
+# A schedule rule expands into classes, skipping the ones that already exist at a scheduled time, so
+# rerunning a schedule (or widening its range) only fills the gaps, never duplicates a class.
+
+import time as clock
+from datetime import date, datetime, time
+
+from sqlalchemy import select
+
+from backend import aggregates, jobs, models, schedule, schemas, storage
+
+
+def rule(courses, **fields):
+    return {"course_codes": [course.code for course in courses], "weekdays": ["mon", "wed"], "time": "09:00:00",
+            "start_date": "2026-01-05", "end_date": "2026-01-18", **fields}
+
+def post(client, body):
+    response = client.post("/course_classes/schedule", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def class_times(db, course):
+    db.expire_all()
+    return db.scalars(select(models.CourseClass.date_time).where(models.CourseClass.course_code == course.code).order_by(models.CourseClass.date_time)).all()
+
+
+def test_occurrences():
+    assert schedule.occurrences(["mon", "wed"], time(9), date(2026, 1, 5), date(2026, 1, 14), skip=[date(2026, 1, 7)]) == [
+        datetime(2026, 1, 5, 9), datetime(2026, 1, 12, 9), datetime(2026, 1, 14, 9)]
+
+def test_rerun_skips_existing_classes(db, client, make_course):
+    # the first course already has its 2026-01-05 09:00 class
+    first, second = make_course(classes=1), make_course(classes=0)
+
+    report = post(client, rule([first, second]))
+    assert (report["courses"], report["classes_created"], report["classes_skipped"]) == (2, 7, 1)
+    assert class_times(db, first) == class_times(db, second) == [datetime(2026, 1, d, 9) for d in (5, 7, 12, 14)]
+
+    report = post(client, rule([first, second]))
+    assert (report["classes_created"], report["classes_skipped"], report["attendance_seeded"]) == (0, 8, 0)
+
+    report = post(client, rule([first, second], end_date="2026-01-21"))
+    assert (report["classes_created"], report["classes_skipped"]) == (4, 8)
+    assert len(class_times(db, first)) == len(set(class_times(db, first))) == 6
+
+    db.commit()
+    assert aggregates.rebuild(db) == {"student_course": 0, "course_class": 0}
+    stats = client.get(f"/stats/students/{first.students[0]}/courses/{first.code}").json()
+    assert stats["total"] == 6
+
+def test_lazy_seeding_job_fills_only_unseeded_classes(db, client, make_course):
+    course = make_course(classes=1)
+    report = post(client, rule([course], seed="lazy"))
+    assert report["classes_created"] == 3
+    if not storage.LAZY:
+        # eager storage seeds the new classes' 3 x 4 rows in a background job
+        deadline = clock.monotonic() + 10
+        while jobs.queue.store.get(report["seed_job_id"])["finished_at"] is None and clock.monotonic() < deadline:
+            clock.sleep(0.01)
+        assert jobs.queue.store.get(report["seed_job_id"])["result"] == {"attendance_seeded": 12}
+
+    assert schedule.seed_pending(db, schemas.ScheduleCreate(**rule([course]))) == 0
+    db.commit()
+    assert aggregates.rebuild(db) == {"student_course": 0, "course_class": 0}
+    stats = client.get(f"/stats/students/{course.students[0]}/courses/{course.code}").json()
+    assert stats["total"] == 4
+
+def test_rejected_rules(client, make_course):
+    course = make_course(classes=0)
+    assert client.post("/course_classes/schedule", json=rule([course], end_date="2026-01-01")).status_code == 400
+    response = client.post("/course_classes/schedule", json={**rule([course]), "course_codes": [course.code, "missing"]})
+    assert response.status_code == 404
+    assert "missing" in response.json()["detail"]
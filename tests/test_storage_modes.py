@@ -0,0 +1,108 @@
+# Plays the same scenario under ATTENDANCE_STORAGE=eager and lazy and compares what the attendance
+# routes return. The mode is fixed when the backend is imported, so each one runs in its own process
+# against its own database (python -m tests.test_storage_modes prints one mode's results). Ids
+# differ between the modes, lazy giving unmarked cells virtual ids, so cells are compared as
+# [course_class_id, student_id, present].
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+PREFIX = "test-modes"
+COURSES = [f"{PREFIX}-a", f"{PREFIX}-b"]
+
+
+def cells(items):
+    return sorted([cell["course_class_id"], cell["student_id"], cell["present"]] for cell in items)
+
+def walk(client, params, between=None):
+    # every page of /attendance/ in order; between(items) runs after each page
+    seen, cursor = [], None
+    while True:
+        page = client.get("/attendance/", params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        seen += [[cell["course_class_id"], cell["student_id"]] for cell in page["items"]]
+        if between is not None:
+            between(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen
+
+def scenario():
+    from fastapi.testclient import TestClient
+
+    from backend.database import SessionLocal
+    from backend.main import app
+    from benchmarks.dataset import seed_prefixed
+
+    client = TestClient(app)
+    db = SessionLocal()
+    _, students = seed_prefixed(db, PREFIX, 6, COURSES, students_per_course=4, spread=2)
+    db.close()
+    for day in range(3):
+        for code in COURSES:
+            client.post("/course_classes/", json={"course_code": code, "date_time": (datetime(2026, 1, 5, 9) + timedelta(days=day)).isoformat()}).raise_for_status()
+
+    # marks through both routes, the single one by the id a listing gave (virtual under lazy)
+    client.put("/attendance/batch", json={"course_class_id": 1, "present": students[:2]}).raise_for_status()
+    client.put("/attendance/batch", json={"course_class_id": 4, "all_present_except": [students[5]]}).raise_for_status()
+    listed = client.get("/attendance/", params={"course_class_id": 2}).json()["items"]
+    client.put(f"/attendance/{listed[1]['id']}", params={"present": True}).raise_for_status()
+
+    # a page walk that marks the cells it just read and one ahead of the cursor must still see each cell once
+    everything = walk(client, {"limit": 1000})
+    ahead = client.get("/attendance/", params={"course_class_id": everything[15][0], "student_id": everything[15][1]}).json()["items"][0]
+    marked = []
+    def mark(items):
+        if not marked:
+            for cell in [*items, ahead]:
+                if not cell["present"]:
+                    marked.append(client.put(f"/attendance/{cell['id']}", params={"present": True}).status_code)
+
+    return {
+        "walk": walk(client, {"limit": 5}, mark),
+        "marked": marked,
+        "list": cells(client.get("/attendance/", params={"limit": 1000}).json()["items"]),
+        "course": walk(client, {"limit": 3, "course_code": COURSES[1]}),
+        "student": walk(client, {"limit": 2, "student_id": students[2]}),
+        "class": walk(client, {"limit": 2, "course_class_id": 3}),
+        "by_student": {s: cells(client.get(f"/attendance/student/{s}").json()) for s in students},
+        "by_class": {c: cells(client.get(f"/attendance/course_class_id/{c}").json()) for c in range(1, 7)},
+        "student_stats": {s: client.get(f"/stats/students/{s}").json() for s in students},
+        "class_stats": {c: client.get(f"/stats/course_classes/{c}").json() for c in range(1, 7)},
+        "matrix": {code: client.get(f"/courses/{code}/attendance_matrix").json() for code in COURSES},
+    }
+
+
+def run(mode):
+    env = {**os.environ, "ATTENDANCE_STORAGE": mode, "DATABASE_URL": f"sqlite:///{tempfile.mkdtemp(prefix='attendance-tests-')}/test.db"}
+    result = subprocess.run([sys.executable, "-m", "tests.test_storage_modes"], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+@pytest.fixture(scope="module")
+def results():
+    return {mode: run(mode) for mode in ("eager", "lazy")}
+
+
+@pytest.mark.parametrize("view", ["list", "course", "student", "class", "by_student", "by_class", "student_stats", "class_stats", "matrix"])
+def test_lazy_matches_eager(results, view):
+    assert results["lazy"][view] == results["eager"][view]
+
+@pytest.mark.parametrize("mode", ["eager", "lazy"])
+def test_walk_sees_every_cell_once(results, mode):
+    walked = results[mode]["walk"]
+    assert results[mode]["marked"] and set(results[mode]["marked"]) == {200}
+    assert sorted(walked) == sorted([cell[0], cell[1]] for cell in results[mode]["list"])
+    assert len(walked) == len({tuple(cell) for cell in walked})
+
+
+if __name__ == "__main__":
+    print(json.dumps(scenario()))